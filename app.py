@@ -1,40 +1,73 @@
 import streamlit as st
 import pandas as pd
-import os
-from PIL import Image
-import difflib
 import datetime
+import functools
+import os
+
+from kyla.api import API_URL_ENV
+from kyla.catalog import SharedCatalog
+from kyla.compact import memory_report, split_amenities
+from kyla.core import (
+    BAD_FORMAT, MISSING_FILES, NO_PROPERTIES, NO_USERS, STORE_FAILED,
+    LoadError, clamp_page, find_user, inbox_page, load_tables, open_default_store,
+)
+from kyla.documents import DocumentStore
+from kyla.images import ImagePipeline
+from kyla.metrics import LOG_ENV, Metrics
+from kyla.planner import Query
+from kyla.querycache import QueryCache
+from kyla.saved_searches import SearchMatcher, describe_query, query_from_json, query_to_json
+from kyla.storage import STATUS_APPROVED, STATUS_PENDING, STATUS_REJECTED, DuplicateEmailError, StoreError
+from kyla.writer import WriteQueue
 
 # ======================
 # CONFIGURACIÓN INICIAL
 # ======================
 st.set_page_config(page_title="Kyla", layout="wide")
+
+# "indexed" puntúa solo candidatos del índice; "compat" reproduce la búsqueda anterior
+SEARCH_MODE = "indexed"
+
+# Paginación del listado de inicio
+PAGE_SIZE_OPTIONS = [10, 20, 50]
+DEFAULT_PAGE_SIZE = 20
+INBOX_PAGE_SIZE = 10
+
+# Si la API (python -m kyla.api) está publicada, los adjuntos se descargan de
+# ella por bloques; si no, desde la app
+API_URL = os.environ.get(API_URL_ENV, "").rstrip("/")
+
+# Nombre visible de cada servicio del CSV (los demás se muestran capitalizados)
+AMENITY_LABELS = {
+    "wifi": "Wifi",
+    "elevator": "Ascensor",
+    "parking": "Parqueadero",
+    "pool": "Piscina",
+    "gym": "Gimnasio",
+    "laundry": "Lavandería",
+    "balcony": "Balcón",
+    "security": "Vigilancia",
+    "furnished": "Amoblado",
+    "pets": "Mascotas",
+    "garden": "Jardín",
+    "terrace": "Terraza",
+}
+
+# Mensaje para cada motivo de error de carga
+LOAD_ERRORS = {
+    MISSING_FILES: "❌ No se encontraron los archivos de datos. Verifica que están en GitHub.",
+    STORE_FAILED: "❌ No se pudo abrir la base de datos.",
+    NO_PROPERTIES: "❌ No hay propiedades cargadas.",
+    NO_USERS: "❌ No hay usuarios cargados.",
+    BAD_FORMAT: "❌ Error al cargar los datos. Verifica el formato de los CSV.",
+}
+
 st.markdown("<h1 style='text-align: center; color: #4A90E2;'>🏡 Kyla</h1>", unsafe_allow_html=True)
 st.markdown("<p style='text-align: center; color: gray;'>Encuentra o publica tu próximo hogar</p>", unsafe_allow_html=True)
 
 # ======================
 # FUNCIONES DE UTILIDAD
 # ======================
-def normalize_text(text):
-    text = str(text).lower().strip()
-    replacements = {
-        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-        'ñ': 'n', 'ü': 'u'
-    }
-    for a, b in replacements.items():
-        text = text.replace(a, b)
-    return text
-
-def is_match(query, text, threshold=0.4):
-    if not query or not text:
-        return False
-    q = normalize_text(query)
-    t = normalize_text(text)
-    if q in t:
-        return True
-    score = difflib.SequenceMatcher(None, q, t).ratio()
-    return score >= threshold
-
 def clear_session():
     """Limpia todos los datos de sesión relacionados con la autenticación"""
     st.session_state.logged_in = False
@@ -45,53 +78,94 @@ def clear_session():
 # ======================
 # CARGA DE DATOS
 # ======================
-@st.cache_data
+@st.cache_resource
+def get_image_pipeline():
+    """Manifiesto de miniaturas y caché de imágenes, uno por proceso"""
+    pipeline = ImagePipeline()
+    # Generar al arrancar las variantes nuevas o modificadas; las posteriores las genera get
+    pipeline.refresh()
+    return pipeline
+
+
+@st.cache_resource
+def get_metrics():
+    """Tiempos por etapa de los reruns de todas las sesiones"""
+    return Metrics()
+
+
+@st.cache_resource
+def get_query_cache():
+    """Resultados de búsqueda recientes, compartidos por todas las sesiones"""
+    return QueryCache()
+
+
+@st.cache_resource
+def get_documents():
+    """Documentos adjuntos de las solicitudes, guardados por su hash"""
+    return DocumentStore()
+
+
+@st.cache_resource
+def get_store():
+    """Almacenamiento compartido por el proceso; migra los CSV la primera vez"""
+    return open_default_store()
+
+
+@st.cache_resource
+def get_writer():
+    """Único escritor del proceso: las escrituras de todas las sesiones se confirman por lotes"""
+    return WriteQueue(get_store())
+
+
+def write(fn, *args):
+    """Ejecuta un método de escritura del store en el escritor y espera a que esté guardado"""
+    with trace.stage("write"):
+        return get_writer().call(fn, *args)
+
+
 def load_data():
+    """Carga las tablas con el núcleo y traduce sus errores a mensajes"""
     try:
-        properties = pd.read_csv("data/properties.csv", encoding="utf-8")
-        users = pd.read_csv("data/users.csv", encoding="utf-8")
-
-        # Validar que no estén vacíos
-        if properties.empty:
-            st.error("❌ El archivo 'properties.csv' está vacío.")
-            st.stop()
-
-        if users.empty:
-            st.error("❌ El archivo 'users.csv' está vacío.")
-            st.stop()
-
-        # Asegurar que el precio sea numérico
-        properties["price"] = pd.to_numeric(properties["price"], errors="coerce")
-        properties = properties.dropna(subset=["price"])
-        properties["price"] = properties["price"].astype(int)
-
-        # Asegurar que las columnas de texto sean strings
-        for col in ["title", "location", "description", "amenities"]:
-            if col in properties.columns:
-                properties[col] = properties[col].astype(str).fillna("")
-
-        # Asegurar que el email y contraseña sean string
-        users["email"] = users["email"].astype(str).fillna("")
-        users["password"] = users["password"].astype(str)
-
-        return properties, users
-
-    except FileNotFoundError as e:
-        st.error("❌ No se encontraron los archivos de datos. Verifica que están en GitHub.")
-        st.stop()
-    except Exception as e:
-        st.error("❌ Error al cargar los datos. Verifica el formato de los CSV.")
-        st.stop()
-
-# Cargar datos y guardar en session_state
-if "properties_df" not in st.session_state or "users_df" not in st.session_state:
-    st.session_state.properties_df, st.session_state.users_df = load_data()
-
-# Verificar que los DataFrames existan
-if "properties_df" not in st.session_state or "users_df" not in st.session_state:
-    st.error("❌ Error crítico: No se pudieron cargar los datos.")
+        properties, users, change_seq = load_tables(get_store())
+    except LoadError as e:
+        reason = e.reason
+    except FileNotFoundError:
+        reason = MISSING_FILES
+    except StoreError:
+        reason = STORE_FAILED
+    except Exception:
+        reason = BAD_FORMAT
+    else:
+        return properties, users, change_seq
+
+    st.error(LOAD_ERRORS[reason])
     st.stop()
 
+
+@st.cache_resource
+def get_shared_catalog():
+    """Catálogo único por proceso; las sesiones solo guardan referencias a sus versiones"""
+    return SharedCatalog(load_data, get_store())
+
+
+@st.cache_resource
+def get_search_matcher():
+    """Comparación de propiedades nuevas con las búsquedas guardadas, una por proceso"""
+    return SearchMatcher(get_store())
+
+
+# Traza de este rerun: cada etapa se mide con trace.stage(...)
+trace = get_metrics().trace()
+
+# Versión del catálogo para este rerun: una referencia, no una copia. Si el
+# store tiene cambios nuevos (de cualquier sesión o proceso) se aplican solo esos
+with trace.stage("load"):
+    st.session_state.catalog = get_shared_catalog().refresh()
+
+# Propiedades nuevas o modificadas contra las búsquedas guardadas (solo si hubo cambios)
+with trace.stage("matches"):
+    get_search_matcher().run(st.session_state.catalog)
+
 # ======================
 # ESTADO DE SESIÓN
 # ======================
@@ -103,44 +177,128 @@ if "current_page" not in st.session_state:
     st.session_state.current_page = "home"
 if "selected_property" not in st.session_state:
     st.session_state.selected_property = None
-if "applications" not in st.session_state:
-    st.session_state.applications = []
 
 
 # ======================
 # FUNCIONES AUXILIARES
 # ======================
 def get_user(email):
-    """Obtiene un usuario por email con manejo robusto de discrepancias"""
-    if not email or email.strip() == "":
-        return None
+    """Obtiene un usuario por email usando el índice de emails normalizados"""
+    with trace.stage("get_user"):
+        return find_user(st.session_state.catalog, email)
 
-    # Normalizar email: minúsculas y sin espacios
-    normalized_email = email.strip().lower()
+def reload_catalog():
+    """Aplica los cambios pendientes del store y publica la versión para todas las sesiones"""
+    st.session_state.catalog = get_shared_catalog().refresh()
 
-    # Verificar que users_df exista
-    if "users_df" not in st.session_state:
-        return None
 
-    users_df = st.session_state.users_df
+def get_results(query):
+    """Posiciones de fila que cumplen los filtros, compartidas entre sesiones"""
+    catalog = st.session_state.catalog
 
-    # Buscar usuario con manejo robusto
-    try:
-        # Primero intentar con str.lower() (más rápido)
-        user = users_df[users_df["email"].str.lower() == normalized_email]
-
-        # Si no encuentra, intentar con strip() adicional
-        if user.empty:
-            users_df["email_clean"] = users_df["email"].str.strip().str.lower()
-            user = users_df[users_df["email_clean"] == normalized_email]
-            users_df.drop(columns=["email_clean"], inplace=True)
-    except:
-        # Si hay error con str.lower(), buscar manualmente
-        user = users_df[users_df["email"].apply(lambda x: str(x).strip().lower() == normalized_email)]
-
-    if not user.empty:
-        return user.iloc[0]
-    return None
+    # El planificador empieza por el filtro más selectivo (texto o rangos); las
+    # consultas repetidas (por cualquier sesión) se sirven desde la caché
+    positions = get_query_cache().lookup(catalog, query, SEARCH_MODE)
+
+    # Nueva consulta: se vuelve a la primera página
+    key = (query, catalog.version)
+    if st.session_state.get("home_query") != key:
+        st.session_state.home_query = key
+        st.session_state.home_page = 0
+    return positions
+
+
+def save_search(query):
+    """Callback de "Guardar búsqueda" en el inicio"""
+    user = get_user(st.session_state.user_email)
+    if user is None:
+        return
+    write(get_store().add_saved_search, {
+        "user_id": int(user["id"]),
+        "name": describe_query(query),
+        "query": query_to_json(query),
+        "created_seq": st.session_state.catalog.change_seq,
+    })
+    st.session_state.home_notice = "💾 Búsqueda guardada. Verás las nuevas coincidencias en tu perfil."
+
+
+def delete_search(search_id, user_id):
+    write(get_store().delete_saved_search, search_id, user_id)
+
+
+def mark_matches_seen(user_id):
+    write(get_store().mark_matches_seen, user_id)
+
+
+def pick_suggestion():
+    """Callback de las sugerencias: el texto elegido pasa al buscador como valor exacto"""
+    picked = st.session_state.pop("search_suggestion", None)
+    if picked is not None:
+        st.session_state.search_text = picked
+        st.session_state.search_exact = picked
+
+
+def show_suggestions(text):
+    """Ubicaciones y títulos que empiezan por lo escrito, más populares primero"""
+    with trace.stage("suggest"):
+        suggestions = st.session_state.catalog.suggest(text)
+    if not suggestions:
+        return
+    icons = {"location": "📍", "title": "🏠"}
+    labels = {display: f"{icons.get(col, '')} {display} ({count})" for col, _, display, count in suggestions}
+    st.pills("Sugerencias", list(labels), format_func=labels.get, key="search_suggestion",
+             on_change=pick_suggestion, label_visibility="collapsed")
+
+
+def set_home_page(page):
+    st.session_state.home_page = page
+
+
+def set_inbox_page(page):
+    st.session_state.inbox_page = page
+
+
+def on_page_size_change():
+    st.session_state.home_page = 0
+
+
+def amenity_label(name):
+    return AMENITY_LABELS.get(name, name.capitalize())
+
+
+def go_to(page, **state):
+    """Callback de navegación: cambia de página antes del rerun, sin un rerun extra"""
+    st.session_state.current_page = page
+    for key, value in state.items():
+        st.session_state[key] = value
+
+
+def timed_fragment(page):
+    """``st.fragment`` cuyos reruns parciales se miden como la página ``page (fragmento)``"""
+    def decorate(fn):
+        @st.fragment
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            global trace
+            # Dentro de un rerun completo se mide con la traza de ese rerun
+            if not trace.finished:
+                return fn(*args, **kwargs)
+            trace = get_metrics().trace()
+            try:
+                with trace.stage("render"):
+                    return fn(*args, **kwargs)
+            finally:
+                trace.finish(f"{page} (fragmento)", catalog_version=st.session_state.catalog.version)
+        return run
+    return decorate
+
+
+def on_nav_change():
+    """Sincroniza la página actual con la opción elegida en la barra lateral"""
+    if st.session_state.nav_page == "Inicio":
+        st.session_state.current_page = "home"
+    elif st.session_state.nav_page == "Mi perfil":
+        st.session_state.current_page = "profile"
 
 # ======================
 # PÁGINAS DE LA APP
@@ -176,18 +334,10 @@ def show_auth():
         if st.button("Registrarse"):
             email = email.strip().lower()  # Normalizar a minúsculas
 
-            # Verificar que los DataFrames existan
-            if "users_df" not in st.session_state:
-                st.error("❌ Error de carga de datos. Recarga la página.")
-                return
-
-            users_df = st.session_state.users_df
-
-            if get_user(email):
+            if get_user(email) is not None:
                 st.error("Este email ya está registrado.")
             else:
-                new_user = pd.DataFrame([{
-                    "id": len(users_df) + 1,
+                user_row = {
                     "name": name,
                     "email": email,  # Guardar en minúsculas
                     "password": password,
@@ -195,112 +345,159 @@ def show_auth():
                     "rating_count": 0,
                     "rating_avg": 0,
                     "is_owner": int(is_owner)
-                }])
+                }
 
-                # Guardar en CSV
-                new_user.to_csv("data/users.csv", mode="a", header=False, index=False)
+                # Guardar en la base de datos: el id lo asigna el store y el email
+                # se comprueba de nuevo al insertar (otra sesión pudo registrarlo)
+                try:
+                    user_row["id"] = write(get_store().add_user, user_row)
+                except DuplicateEmailError:
+                    st.error("Este email ya está registrado.")
+                    return
 
-                # Recargar los datos
-                st.cache_data.clear()
-                st.session_state.properties_df, st.session_state.users_df = load_data()
+                # Aplicar solo el usuario nuevo al catálogo compartido:
+                # todas las sesiones lo ven sin recargar nada
+                reload_catalog()
 
                 st.success("✅ ¡Cuenta creada! Ya puedes iniciar sesión.")
                 st.balloons()
 
 
 def show_home():
-    # Verificar que los DataFrames existan en session_state
-    if "properties_df" not in st.session_state or "users_df" not in st.session_state:
-        st.error("❌ Error de carga de datos. Recarga la página.")
-        return
-
-    properties_df = st.session_state.properties_df
-    users_df = st.session_state.users_df
-
     st.markdown("### 🏠 Encuentra tu próximo hogar")
 
     col1, col2, col3 = st.columns([2, 1, 1])
     with col1:
-        search = st.text_input("Buscar por ubicación, nombre o características")
+        search = st.text_input("Buscar por ubicación, nombre o características", key="search_text")
+        # Texto elegido de las sugerencias: se busca el valor exacto, sin puntuación difusa
+        exact = bool(search.strip()) and st.session_state.get("search_exact") == search
+        if search.strip() and not exact:
+            show_suggestions(search)
     with col2:
         min_price = st.number_input("Precio mínimo", 0, 10000000, 0)
     with col3:
         max_price = st.number_input("Precio máximo", 0, 10000000, 2000000)
 
-    # Aplicar filtros
-    filtered = properties_df.copy()
+    with st.expander("Más filtros"):
+        col1, col2, col3, col4, col5 = st.columns(5)
+        with col1:
+            min_beds = st.number_input("Habitaciones mín.", 0, 20, 0)
+        with col2:
+            min_baths = st.number_input("Baños mín.", 0, 20, 0)
+        with col3:
+            min_area = st.number_input("Área mín. (m²)", 0, 100000, 0)
+        with col4:
+            max_area = st.number_input("Área máx. (m²)", 0, 100000, 0, help="0 = sin límite")
+        with col5:
+            min_rating = st.number_input("Calificación mín.", 0.0, 5.0, 0.0, step=0.5)
+
+    # Los filtros en su valor por defecto no se evalúan
+    query = Query(
+        text=search,
+        min_price=min_price,
+        max_price=max_price,
+        min_beds=min_beds or None,
+        min_baths=min_baths or None,
+        min_area=min_area or None,
+        max_area=max_area or None,
+        min_rating=min_rating or None,
+        amenities=tuple(sorted(st.session_state.get("amenity_filter", []))),
+        exact=exact,
+    )
 
-    # Búsqueda inteligente
-    if search:
-        filtered = filtered[
-            filtered.apply(
-                lambda row: is_match(search, row["title"]) or is_match(search, row["location"]),
-                axis=1
-            )
-        ]
+    # El resultado completo se calcula una vez; cada página es solo un corte
+    with trace.stage("search"):
+        positions = get_results(query)
+
+    # Facetas de servicios con la cantidad de resultados actuales que tiene cada una
+    catalog = st.session_state.catalog
+    with trace.stage("facets"):
+        counts = catalog.facet_counts(positions)
+    st.multiselect(
+        "Servicios", catalog.amenity_index.vocab, key="amenity_filter",
+        format_func=lambda name: f"{amenity_label(name)} ({counts.get(name, 0)})",
+        placeholder="Filtrar por servicios",
+    )
 
-    # Filtro de precio
-    filtered = filtered[(filtered["price"] >= min_price) & (filtered["price"] <= max_price)]
+    if st.session_state.logged_in:
+        st.button("💾 Guardar búsqueda", on_click=save_search, args=(query,),
+                  help="Te avisamos en tu perfil cuando se publiquen propiedades que coincidan")
+        if "home_notice" in st.session_state:
+            st.success(st.session_state.pop("home_notice"))
 
-    # Mostrar resultados
-    if filtered.empty:
+    if len(positions) == 0:
         st.info("📭 No se encontraron propiedades con esos filtros.")
-    else:
-        for _, prop in filtered.iterrows():
-            owner = users_df[users_df["id"] == prop["owner_id"]].iloc[0]
-            with st.container():
-                cols = st.columns([1, 3, 1])
-                with cols[0]:
-                    img_path = f"assets/images/{prop['images'].split(',')[0]}"
-                    if os.path.exists(img_path):
-                        image = Image.open(img_path)
-                        st.image(image, width=120)
-                with cols[1]:
-                    st.markdown(f"**{prop['title']}**")
-                    st.markdown(f"📍 {prop['location']} | 💰 ${prop['price']:,} COP")
-                    st.markdown(f"🛏️ {prop['beds']} | 🛁 {prop['baths']} | 📏 {prop['area']} m² | ⭐ {prop['rating']}")
-                    st.markdown(f"🏠 Arrendador: {owner['name']} (⭐ {owner['rating_avg']})")
-                with cols[2]:
-                    if st.button("Ver", key=f"view_{prop['id']}"):
-                        st.session_state.selected_property = prop["id"]
-                        st.session_state.current_page = "property_detail"
-                        st.rerun()  # ¡CRÍTICO!
-                st.markdown("---")
+        return
+
+    show_listing(positions)
+
+
+@timed_fragment("home")
+def show_listing(positions):
+    """Tarjetas de la página visible y paginación; cambiar de página solo rerenderiza esto"""
+    properties_df = st.session_state.catalog.properties
+    page_size = st.session_state.get("page_size", DEFAULT_PAGE_SIZE)
+    page, total_pages = clamp_page(len(positions), st.session_state.get("home_page", 0), page_size)
+    start = page * page_size
+
+    images = get_image_pipeline()
+
+    # Solo se materializan las filas de la página visible (ya unidas con su dueño)
+    with trace.stage("rows"):
+        page_rows = properties_df.iloc[positions[start:start + page_size]]
+
+    for _, prop in page_rows.iterrows():
+        with st.container():
+            cols = st.columns([1, 3, 1])
+            with cols[0]:
+                with trace.stage("images"):
+                    thumb = images.get(prop["images"].split(",")[0], "thumb")
+                if thumb is not None:
+                    st.image(thumb, width=120)
+            with cols[1]:
+                st.markdown(f"**{prop['title']}**")
+                st.markdown(f"📍 {prop['location']} | 💰 ${prop['price']:,} COP")
+                st.markdown(f"🛏️ {prop['beds']} | 🛁 {prop['baths']} | 📏 {prop['area']} m² | ⭐ {prop['rating']:g}")
+                st.markdown(f"🏠 Arrendador: {prop['owner_name']} (⭐ {prop['owner_rating_avg']:g})")
+            with cols[2]:
+                if st.button("Ver", key=f"view_{prop['id']}"):
+                    st.session_state.selected_property = prop["id"]
+                    st.session_state.current_page = "property_detail"
+                    st.rerun()  # Cambio de página: rerun completo
+            st.markdown("---")
+
+    # Controles de paginación
+    col1, col2, col3, col4 = st.columns([1, 2, 1, 1])
+    with col1:
+        st.button("⬅️ Anterior", key="page_prev", disabled=page == 0,
+                  on_click=set_home_page, args=(page - 1,), use_container_width=True)
+    with col2:
+        st.markdown(f"Página {page + 1} de {total_pages} · {len(positions)} resultados")
+    with col3:
+        st.button("Siguiente ➡️", key="page_next", disabled=page >= total_pages - 1,
+                  on_click=set_home_page, args=(page + 1,), use_container_width=True)
+    with col4:
+        st.selectbox("Por página", PAGE_SIZE_OPTIONS, index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE),
+                     key="page_size", on_change=on_page_size_change, label_visibility="collapsed")
 
 
 def show_property_detail():
     prop_id = st.session_state.selected_property
     if not prop_id:
         st.error("No se seleccionó ninguna propiedad.")
-        if st.button("Volver al inicio"):
-            st.session_state.current_page = "home"
-            st.rerun()
+        st.button("Volver al inicio", on_click=go_to, args=("home",))
         return
 
     # Buscar propiedad
-    prop = properties_df[properties_df["id"] == prop_id]
-    if prop.empty:
+    with trace.stage("rows"):
+        prop = st.session_state.catalog.get_property(prop_id)
+    if prop is None:
         st.error("❌ Propiedad no encontrada.")
-        if st.button("Volver al inicio"):
-            st.session_state.current_page = "home"
-            st.session_state.selected_property = None
-            st.rerun()
+        st.button("Volver al inicio", on_click=go_to, args=("home",), kwargs={"selected_property": None})
         return
 
-    prop = prop.iloc[0]
-    owner = users_df[users_df["id"] == prop["owner_id"]].iloc[0]
-
     # Mostrar imágenes
-    valid_images = []
-    for img in prop["images"].split(","):
-        img_path = f"assets/images/{img.strip()}"
-        if os.path.exists(img_path):
-            valid_images.append(img_path)
-
-    if valid_images:
-        st.image(valid_images, width=300)
-    else:
-        st.image("https://via.placeholder.com/300x200?text=Sin+imagen", width=300)
+    show_gallery(int(prop["id"]), prop["images"].split(","))
 
     # Detalles de la propiedad
     st.title(prop["title"])
@@ -308,46 +505,88 @@ def show_property_detail():
     st.markdown(f"**Precio:** ${prop['price']:,} COP/mes")
     st.markdown(f"**Características:** {prop['beds']} hab, {prop['baths']} baños, {prop['area']} m²")
     st.write(prop["description"])
-    st.markdown(f"**Servicios:** {prop['amenities'].replace(',', ', ')}")
+    st.markdown(f"**Servicios:** {', '.join(amenity_label(a) for a in split_amenities(prop['amenities']))}")
 
     st.markdown("---")
     st.subheader("👤 Arrendador")
-    st.markdown(f"**Nombre:** {owner['name']}")
-    st.markdown(f"**Teléfono:** {owner['phone']}")
-    st.markdown(f"**Reputación:** ⭐ {owner['rating_avg']} ({owner['rating_count']} reseñas)")
+    st.markdown(f"**Nombre:** {prop['owner_name']}")
+    st.markdown(f"**Teléfono:** {prop['owner_phone']}")
+    st.markdown(f"**Reputación:** ⭐ {prop['owner_rating_avg']:g} ({prop['owner_rating_count']} reseñas)")
 
     # Botones de acción
     col1, col2 = st.columns(2)
     with col1:
-        if st.button("📩 Contactar arrendador", use_container_width=True):
-            st.success("Mensaje enviado. ¡El arrendador se pondrá en contacto contigo!")
+        show_contact_button()
 
     with col2:
-        if st.button("📩 Iniciar proceso de arrendamiento", type="primary", use_container_width=True):
-            st.session_state.current_page = "rental_application"
-            st.rerun()  # ¡ESTO ES LO QUE FALTABA!
+        st.button("📩 Iniciar proceso de arrendamiento", type="primary", use_container_width=True,
+                  on_click=go_to, args=("rental_application",))
+
+    show_similar(int(prop["id"]))
+
+    st.button("⬅️ Volver al inicio", use_container_width=True,
+              on_click=go_to, args=("home",), kwargs={"selected_property": None})
 
-    if st.button("⬅️ Volver al inicio", use_container_width=True):
-        st.session_state.current_page = "home"
-        st.session_state.selected_property = None
-        st.rerun()
+
+def show_similar(prop_id):
+    """Propiedades parecidas en precio, tamaño, ubicación y servicios"""
+    catalog = st.session_state.catalog
+    with trace.stage("similar"):
+        similar = catalog.properties.iloc[catalog.similar(prop_id)]
+    if similar.empty:
+        return
+
+    st.markdown("---")
+    st.subheader("🏘️ Propiedades similares")
+    images = get_image_pipeline()
+    for col, (_, prop) in zip(st.columns(len(similar)), similar.iterrows()):
+        with col:
+            with trace.stage("images"):
+                thumb = images.get(prop["images"].split(",")[0], "thumb")
+            if thumb is not None:
+                st.image(thumb, width=120)
+            st.markdown(f"**{prop['title']}**")
+            st.caption(f"📍 {prop['location']} · ${prop['price']:,} COP · 🛏️ {prop['beds']}")
+            st.button("Ver", key=f"similar_{prop['id']}", use_container_width=True,
+                      on_click=go_to, args=("property_detail",), kwargs={"selected_property": int(prop["id"])})
+
+
+@timed_fragment("property_detail")
+def show_gallery(prop_id, image_names):
+    """Fotos de la propiedad; pasar de foto solo rerenderiza la galería"""
+    images = get_image_pipeline()
+    with trace.stage("images"):
+        photos = [data for data in (images.get(name, "detail") for name in image_names) if data is not None]
+
+    if not photos:
+        st.image("https://via.placeholder.com/300x200?text=Sin+imagen", width=300)
+        return
+
+    index = 0
+    if len(photos) > 1:
+        index = st.select_slider("Foto", options=range(len(photos)), key=f"gallery_{prop_id}",
+                                 format_func=lambda i: f"{i + 1} de {len(photos)}")
+    st.image(photos[index], width=300)
+
+
+@timed_fragment("property_detail")
+def show_contact_button():
+    if st.button("📩 Contactar arrendador", use_container_width=True):
+        st.success("Mensaje enviado. ¡El arrendador se pondrá en contacto contigo!")
 
 
 def show_rental_application():
     prop_id = st.session_state.selected_property
     if not prop_id:
         st.error("No hay propiedad seleccionada.")
-        if st.button("Volver al inicio"):
-            st.session_state.current_page = "home"
-            st.rerun()
+        st.button("Volver al inicio", on_click=go_to, args=("home",))
         return
 
     # Buscar propiedad
-    prop = properties_df[properties_df["id"] == prop_id]
-    if prop.empty:
+    prop = st.session_state.catalog.get_property(prop_id)
+    if prop is None:
         st.error("Propiedad no encontrada.")
         return
-    prop = prop.iloc[0]
 
     user = get_user(st.session_state.user_email)
     if user is None:  # ✅ CORREGIDO
@@ -367,6 +606,15 @@ def show_rental_application():
     - Historial crediticio (opcional)  
     """)
 
+    show_application_form(prop, user)
+
+    # Botón de volver
+    st.button("⬅️ Volver", use_container_width=True, on_click=go_to, args=("property_detail",))
+
+
+@timed_fragment("rental_application")
+def show_application_form(prop, user):
+    """Comentarios, adjuntos y envío; escribir o adjuntar solo rerenderiza el formulario"""
     # Comentarios
     st.markdown("### 💬 Comentarios al arrendador")
     comments = st.text_area("Escribe un mensaje", height=100)
@@ -384,20 +632,31 @@ def show_rental_application():
         if not uploaded_files:
             st.warning("Por favor, adjunta al menos un documento.")
         else:
+            # Guardar los adjuntos en disco por bloques; un documento repetido
+            # (el mismo archivo enviado a varios dueños) se guarda una sola vez
+            documents = get_documents()
+            files = []
+            for uploaded in uploaded_files:
+                uploaded.seek(0)
+                digest, size = documents.put(uploaded)
+                files.append({"name": uploaded.name, "sha256": digest, "size": size})
+
             # Crear nueva solicitud
             new_app = {
-                "property_id": prop["id"],
+                "property_id": int(prop["id"]),
                 "property_title": prop["title"],
+                "owner_id": int(prop["owner_id"]),
+                "applicant_id": int(user["id"]),
                 "applicant_name": user["name"],
                 "applicant_email": user["email"],
                 "comments": comments,
-                "files": [f.name for f in uploaded_files],
-                "status": "En revisión",
-                "timestamp": datetime.datetime.now()
+                "files": files,
+                "status": STATUS_PENDING,
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds")
             }
 
-            # Guardar en sesión
-            st.session_state.applications.append(new_app)
+            # Guardar en la base de datos: el dueño la ve desde cualquier sesión
+            write(get_store().add_application, new_app)
 
             # Confirmación
             st.success("✅ ¡Solicitud enviada con éxito!")
@@ -409,11 +668,6 @@ def show_rental_application():
                 st.session_state.current_page = "home"
                 st.rerun()
 
-    # Botón de volver
-    if st.button("⬅️ Volver", use_container_width=True):
-        st.session_state.current_page = "property_detail"
-        st.rerun()
-
 
 def show_profile():
     # Diagnóstico (quita en producción)
@@ -429,23 +683,16 @@ def show_profile():
         normalized_email = st.session_state.user_email.strip().lower()
         st.write("Email normalizado:", normalized_email)
 
-        # Mostrar emails en el DataFrame
-        if "users_df" in st.session_state:
-            st.write("Emails en users_df:", st.session_state.users_df["email"].tolist())
+        # Mostrar emails en el catálogo
+        users_df = st.session_state.catalog.users
+        st.write("Versión del catálogo:", st.session_state.catalog.version)
+        st.write("Emails en users_df:", users_df["email"].tolist())
 
         # Intentar encontrar coincidencias parciales
-        if "users_df" in st.session_state:
-            possible_matches = st.session_state.users_df[
-                st.session_state.users_df["email"].str.contains(normalized_email, case=False, na=False)
-            ]
-            st.write("Coincidencias parciales:", possible_matches["email"].tolist())
-
-    # Obtener DataFrames
-    if "users_df" not in st.session_state:
-        st.error("❌ Error de carga de datos. Recarga la página.")
-        return
-
-    users_df = st.session_state.users_df
+        possible_matches = users_df[
+            users_df["email"].str.contains(normalized_email, case=False, na=False, regex=False)
+        ]
+        st.write("Coincidencias parciales:", possible_matches["email"].tolist())
 
     # Verificar usuario
     user = get_user(st.session_state.user_email)
@@ -464,8 +711,7 @@ def show_profile():
         col1, col2 = st.columns(2)
         with col1:
             if st.button("🔄 Recargar datos", use_container_width=True):
-                st.cache_data.clear()
-                st.session_state.properties_df, st.session_state.users_df = load_data()
+                reload_catalog()
                 st.rerun()
 
         with col2:
@@ -481,51 +727,148 @@ def show_profile():
     st.markdown(f"**Email:** {user['email']}")
     st.markdown(f"**Teléfono:** {user['phone']}")
     st.markdown(f"**Tipo:** {'Arrendador' if user['is_owner'] else 'Arrendatario'}")
-    st.markdown(f"**Calificación:** ⭐ {user['rating_avg']} ({user['rating_count']} reseñas)")
+    st.markdown(f"**Calificación:** ⭐ {user['rating_avg']:g} ({user['rating_count']} reseñas)")
 
     if st.button("Cerrar sesión", use_container_width=True):
         clear_session()  # Usa la función para limpiar
         st.success("👋 Sesión cerrada correctamente")
         st.rerun()
 
+    st.markdown("---")
+    st.subheader("🔔 Búsquedas guardadas")
+    show_saved_searches(int(user["id"]))
+
     # Buzón de solicitudes (solo para arrendadores)
     if user["is_owner"]:
         st.markdown("---")
         st.subheader("📬 Buzón de solicitudes de arrendamiento")
 
-        # Verificar que applications exista
-        if "applications" not in st.session_state:
-            st.session_state.applications = []
+        show_inbox(int(user["id"]))
 
-        owner_apps = []
-        for app in st.session_state.applications:
-            prop = st.session_state.properties_df[st.session_state.properties_df["id"] == app["property_id"]]
-            if not prop.empty and prop.iloc[0]["owner_id"] == user["id"]:
-                owner_apps.append(app)
 
-        if not owner_apps:
-            st.info("📭 No tienes solicitudes pendientes.")
-        else:
-            for i, app in enumerate(owner_apps):
-                with st.expander(f"📄 {app['applicant_name']} - {app['property_title']}"):
-                    st.write(f"**Email:** {app['applicant_email']}")
-                    st.write(f"**Comentarios:** {app['comments']}")
-                    st.write(f"**Archivos adjuntos:** {', '.join(app['files'])}")
-                    st.write(f"**Fecha:** {app['timestamp'].strftime('%d/%m/%Y %H:%M')}")
-                    st.write(f"**Estado:** {app['status']}")
-
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button("Aprobar", key=f"approve_{i}", use_container_width=True):
-                            app["status"] = "Aprobada"
-                            st.success("✅ Solicitud aprobada")
-                            st.rerun()
-
-                    with col2:
-                        if st.button("Rechazar", key=f"reject_{i}", use_container_width=True):
-                            app["status"] = "Rechazada"
-                            st.warning("🚫 Solicitud rechazada")
-                            st.rerun()
+@timed_fragment("profile")
+def show_saved_searches(user_id):
+    """Búsquedas guardadas y sus nuevas coincidencias; borrar o marcar solo rerenderiza esto"""
+    store = get_store()
+    searches = store.saved_searches(user_id)
+    if not searches:
+        st.info("Guarda una búsqueda desde el inicio para recibir aquí las nuevas coincidencias.")
+        return
+
+    for search in searches:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.markdown(f"🔎 {search['name'] or describe_query(query_from_json(search['query']))}")
+        with col2:
+            st.button("🗑️", key=f"delete_search_{search['id']}", help="Borrar búsqueda",
+                      on_click=delete_search, args=(search["id"], user_id))
+
+    st.markdown("#### ✨ Nuevas coincidencias")
+    matches = store.new_matches_for_user(user_id)
+    catalog = st.session_state.catalog
+    rows = [(match, catalog.get_property(match["property_id"])) for match in matches]
+    rows = [(match, prop) for match, prop in rows if prop is not None]
+    if not rows:
+        st.caption("No hay propiedades nuevas para tus búsquedas.")
+        return
+
+    for match, prop in rows:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.markdown(f"**{prop['title']}** · 📍 {prop['location']} · 💰 ${prop['price']:,} COP")
+            st.caption(f"Coincide con: {match['search_name']}")
+        with col2:
+            st.button("Ver", key=f"match_{match['search_id']}_{match['property_id']}",
+                      on_click=go_to, args=("property_detail",),
+                      kwargs={"selected_property": int(prop["id"])})
+    st.button("Marcar como vistas", on_click=mark_matches_seen, args=(user_id,))
+
+
+@timed_fragment("profile")
+def show_inbox(owner_id):
+    """Página del buzón; paginar solo rerenderiza el buzón"""
+    # Una consulta indexada por dueño, paginada
+    owner_apps, total, page, total_pages = inbox_page(
+        get_store(), owner_id, st.session_state.get("inbox_page", 0), INBOX_PAGE_SIZE
+    )
+
+    if total == 0:
+        st.info("📭 No tienes solicitudes pendientes.")
+        return
+
+    for app in owner_apps:
+        show_inbox_item(app)
+
+    if total_pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("⬅️ Anteriores", key="inbox_prev", disabled=page == 0,
+                      on_click=set_inbox_page, args=(page - 1,), use_container_width=True)
+        with col2:
+            st.markdown(f"Página {page + 1} de {total_pages} · {total} solicitudes")
+        with col3:
+            st.button("Siguientes ➡️", key="inbox_next", disabled=page >= total_pages - 1,
+                      on_click=set_inbox_page, args=(page + 1,), use_container_width=True)
+
+
+def review_application(app, status):
+    """Callback de Aprobar/Rechazar: guarda el estado y actualiza la solicitud mostrada"""
+    write(get_store().set_application_status, app["id"], status)
+    # El fragmento se vuelve a ejecutar con este mismo dict: no hace falta releerlo
+    app["status"] = status
+    st.session_state.inbox_notice = app["id"]
+
+
+def read_document(digest):
+    """Bytes de un adjunto; Streamlit guarda la descarga completa en memoria"""
+    with get_documents().open(digest) as f:
+        return f.read()
+
+
+def show_attachments(app):
+    """Enlaces a la API (descarga por bloques) o botones que leen el archivo solo al pulsarlos"""
+    documents = get_documents()
+    for i, doc in enumerate(app["files"]):
+        if not doc["sha256"] or not documents.exists(doc["sha256"]):
+            continue
+        if API_URL:
+            st.link_button(f"⬇️ {doc['name']}", f"{API_URL}/documents/{doc['sha256']}")
+            continue
+        st.download_button(
+            f"⬇️ {doc['name']}",
+            data=functools.partial(read_document, doc["sha256"]),
+            file_name=doc["name"],
+            key=f"doc_{app['id']}_{i}",
+            on_click="ignore",
+        )
+
+
+@timed_fragment("profile")
+def show_inbox_item(app):
+    """Una solicitud del buzón; aprobar o rechazar solo rerenderiza esta solicitud"""
+    with st.expander(f"📄 {app['applicant_name']} - {app['property_title']}"):
+        st.write(f"**Email:** {app['applicant_email']}")
+        st.write(f"**Comentarios:** {app['comments']}")
+        st.write(f"**Archivos adjuntos:** {', '.join(f['name'] for f in app['files'])}")
+        show_attachments(app)
+        st.write(f"**Fecha:** {app['created_at'].strftime('%d/%m/%Y %H:%M')}")
+        st.write(f"**Estado:** {app['status']}")
+
+        if st.session_state.get("inbox_notice") == app["id"]:
+            del st.session_state.inbox_notice
+            if app["status"] == STATUS_APPROVED:
+                st.success("✅ Solicitud aprobada")
+            else:
+                st.warning("🚫 Solicitud rechazada")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button("Aprobar", key=f"approve_{app['id']}", use_container_width=True,
+                      on_click=review_application, args=(app, STATUS_APPROVED))
+
+        with col2:
+            st.button("Rechazar", key=f"reject_{app['id']}", use_container_width=True,
+                      on_click=review_application, args=(app, STATUS_REJECTED))
 
 
 # ======================
@@ -538,9 +881,23 @@ def main():
         st.write("logged_in:", st.session_state.logged_in)
         st.write("user_email:", st.session_state.user_email)
         st.write("current_page:", st.session_state.current_page)
-        st.write("DataFrames cargados:",
-                 "properties_df" in st.session_state,
-                 "users_df" in st.session_state)
+        st.write("Versión del catálogo:", st.session_state.catalog.version)
+
+        # Memoria del catálogo compartido, por columna
+        catalog = st.session_state.catalog
+        report = memory_report({"properties": catalog.properties, "users": catalog.users})
+        st.write("Memoria del catálogo:", f"{report['bytes'].sum() / 1024:,.1f} KiB")
+        st.dataframe(report, hide_index=True)
+
+        st.write("Caché de búsquedas:", get_query_cache().stats())
+
+        # Tiempos por etapa de los últimos reruns de todas las sesiones
+        metrics = get_metrics()
+        st.write("### Tiempos por etapa")
+        st.dataframe(metrics.summary(), hide_index=True)
+        st.download_button("Descargar trazas (JSONL)", metrics.export_jsonl(),
+                           file_name="kyla-metrics.jsonl", mime="application/json")
+        st.caption(f"Log continuo: define {LOG_ENV} con la ruta de un archivo .jsonl")
 
     # Verificar estado de sesión consistente
     if st.session_state.logged_in and not st.session_state.user_email:
@@ -555,12 +912,11 @@ def main():
         st.rerun()
         return
 
-    # Verificar que los DataFrames estén cargados
-    if "properties_df" not in st.session_state or "users_df" not in st.session_state:
+    # Verificar que el catálogo esté cargado
+    if "catalog" not in st.session_state:
         st.error("❌ Error crítico: No se cargaron los datos.")
         if st.button("Recargar datos"):
-            st.cache_data.clear()
-            st.session_state.properties_df, st.session_state.users_df = load_data()
+            reload_catalog()
             st.rerun()
         return
 
@@ -577,8 +933,7 @@ def main():
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("🔄 Recargar datos", use_container_width=True):
-                    st.cache_data.clear()
-                    st.session_state.properties_df, st.session_state.users_df = load_data()
+                    reload_catalog()
                     st.rerun()
 
             with col2:
@@ -594,23 +949,25 @@ def main():
             st.title("Kyla")
             st.markdown(f"👤 {user['name']}")
 
-            # Navegación
-            page = st.radio("Ir a", ["Inicio", "Mi perfil"])
-
-            if page == "Inicio":
-                st.session_state.current_page = "home"
-            elif page == "Mi perfil":
-                st.session_state.current_page = "profile"
-
-        # Renderizar página actual
-        if st.session_state.current_page == "home":
-            show_home()
-        elif st.session_state.current_page == "property_detail":
-            show_property_detail()
-        elif st.session_state.current_page == "rental_application":
-            show_rental_application()
-        elif st.session_state.current_page == "profile":
-            show_profile()
+            # Navegación: solo cambia de página cuando el usuario elige otra
+            # opción, para no pisar el detalle o la solicitud en cada rerun
+            st.radio("Ir a", ["Inicio", "Mi perfil"], key="nav_page", on_change=on_nav_change)
+
+        # Renderizar página actual (las etapas anidadas se descuentan de "render")
+        with trace.stage("render"):
+            if st.session_state.current_page == "home":
+                show_home()
+            elif st.session_state.current_page == "property_detail":
+                show_property_detail()
+            elif st.session_state.current_page == "rental_application":
+                show_rental_application()
+            elif st.session_state.current_page == "profile":
+                show_profile()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    rerun_page = st.session_state.current_page if st.session_state.logged_in else "auth"
+    try:
+        main()
+    finally:
+        # También se registra cuando main termina con st.rerun() o st.stop()
+        trace.finish(rerun_page, catalog_version=st.session_state.catalog.version)
\ No newline at end of file
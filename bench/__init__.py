@@ -0,0 +1 @@
+"""Benchmarks y generador de datos sintéticos de Kyla."""
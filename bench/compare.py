@@ -0,0 +1,72 @@
+"""Compara dos resultados de ``bench.run`` y marca las regresiones.
+
+Sin argumentos compara los dos resultados más recientes de ``bench/results``.
+Para las latencias se compara el p95; un aumento mayor que ``--threshold``
+cuenta como regresión y el comando termina con código 1.
+
+    python -m bench.compare [base.json nuevo.json] [--threshold 0.1]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from bench.run import RESULTS_DIR
+
+
+def flatten(result):
+    """{(tamaño, métrica): valor} con solo las métricas numéricas"""
+    values = {}
+    for size, metrics in result["sizes"].items():
+        for key, value in metrics.items():
+            if isinstance(value, dict):
+                value = value.get("p95")
+            if isinstance(value, (int, float)) and key != "applications":
+                values[(size, key)] = value
+    return values
+
+
+def compare(base, new, threshold):
+    """Filas ``(tamaño, métrica, base, nuevo, cambio, regresión)`` en común"""
+    base_values, new_values = flatten(base), flatten(new)
+    rows = []
+    for key in sorted(base_values.keys() & new_values.keys(), key=lambda k: (int(k[0]), k[1])):
+        old, current = base_values[key], new_values[key]
+        change = (current - old) / old if old else 0.0
+        rows.append((*key, old, current, change, change > threshold))
+    return rows
+
+
+def latest_results(directory=RESULTS_DIR, count=2):
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+    if len(paths) < count:
+        raise SystemExit(f"Se necesitan {count} resultados en {directory}")
+    return paths[-count:]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos corridas de benchmarks")
+    parser.add_argument("paths", nargs="*", help="base.json nuevo.json (por defecto los dos últimos)")
+    parser.add_argument("--threshold", type=float, default=0.1, help="aumento relativo que cuenta como regresión")
+    args = parser.parse_args(argv)
+    if len(args.paths) not in (0, 2):
+        parser.error(f"se esperaban 0 o 2 resultados, no {len(args.paths)}")
+
+    base_path, new_path = args.paths or latest_results()
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"base {base['commit']} ({base['created_at']}) → nuevo {new['commit']} ({new['created_at']})")
+    regressions = 0
+    for size, metric, old, current, change, regressed in compare(base, new, args.threshold):
+        flag = "  ⚠ regresión" if regressed else ""
+        print(f"{size:>8} {metric:<18} {old:>12.4f} {current:>12.4f} {change:>+8.1%}{flag}")
+        regressions += regressed
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
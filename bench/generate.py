@@ -0,0 +1,126 @@
+"""Generador de datos sintéticos para los benchmarks.
+
+Escribe ``properties.csv`` y ``users.csv`` con el mismo formato que ``data/``
+(las mismas columnas y reglas de limpieza) en ``bench/data/<filas>/``. Los datos son
+deterministas para una semilla dada, así que dos corridas son comparables.
+
+    python -m bench.generate --rows 1000 100000 1000000
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+BENCH_DATA_DIR = os.path.join("bench", "data")
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+SEED = 42
+
+# Un usuario por cada USERS_RATIO propiedades; OWNER_RATIO de ellos son dueños
+USERS_RATIO = 2
+OWNER_RATIO = 0.2
+
+KINDS = ["Casa", "Apartamento", "Apartaestudio", "Habitación", "Loft", "Finca", "Penthouse", "Cabaña"]
+ADJECTIVES = ["básica", "económico", "amplio", "moderno", "iluminado", "campestre", "céntrico",
+              "familiar", "remodelado", "acogedor", "de lujo", "con vista"]
+LOCATIONS = ["Medellín", "Bogotá", "Cali", "Barranquilla", "Cartagena", "Bucaramanga", "Pereira",
+             "Manizales", "Santa Marta", "Cúcuta", "Ibagué", "Villavicencio", "Pasto", "Armenia",
+             "Neiva", "Popayán", "Montería", "Valledupar", "Sincelejo", "Tunja", "Envigado",
+             "Itagüí", "Bello", "Sabaneta", "Rionegro", "Chía", "Soacha", "Zipaquirá", "Palmira",
+             "Buenaventura"]
+NEIGHBORHOODS = ["El Poblado", "Laureles", "Chapinero", "Usaquén", "Granada", "El Prado", "Bocagrande",
+                 "Cabecera", "Centro", "Belén", "Envigado", "La Candelaria", "San Antonio", "Cedritos"]
+DESCRIPTIONS = ["Ideal para estudiantes", "Cerca al transporte público", "Excelente ubicación",
+                "Zona tranquila y segura", "Incluye servicios", "Perfecta para familias",
+                "Recién remodelada", "Con parqueadero cubierto"]
+AMENITIES = ["wifi", "elevator", "parking", "pool", "gym", "laundry", "balcony", "security",
+             "furnished", "pets", "garden", "terrace"]
+FIRST_NAMES = ["Ana", "Luis", "Carla", "Juan", "María", "Pedro", "Sofía", "Andrés", "Valentina",
+               "Camilo", "Laura", "Diego", "Daniela", "Santiago", "Paula", "Felipe"]
+LAST_NAMES = ["López", "Mendoza", "Gómez", "Rodríguez", "Martínez", "García", "Hernández",
+              "Restrepo", "Ramírez", "Torres", "Vargas", "Castro", "Ortiz", "Rojas"]
+
+
+def _pick(rng, choices, n):
+    return np.asarray(choices, dtype=object)[rng.integers(0, len(choices), n)]
+
+
+def _join(*parts):
+    """Concatena columnas de texto elemento a elemento"""
+    out = parts[0].astype(object)
+    for part in parts[1:]:
+        out = out + part
+    return out
+
+
+def generate_users(n_users, rng):
+    ids = np.arange(1, n_users + 1)
+    names = _join(_pick(rng, FIRST_NAMES, n_users), " ", _pick(rng, LAST_NAMES, n_users))
+    is_owner = rng.random(n_users) < OWNER_RATIO
+    # Siempre hay al menos un dueño
+    is_owner[0] = True
+    return pd.DataFrame({
+        "id": ids,
+        "name": names,
+        "email": [f"user{i}@example.com" for i in ids],
+        "password": "123456",
+        "phone": (3_000_000_000 + rng.integers(0, 99_999_999, n_users)).astype(str),
+        "rating_count": rng.integers(0, 200, n_users),
+        "rating_avg": np.round(rng.uniform(3.0, 5.0, n_users), 1),
+        "is_owner": is_owner,
+    })
+
+
+def generate_properties(n_rows, owner_ids, rng):
+    kinds = _pick(rng, KINDS, n_rows)
+    adjectives = _pick(rng, ADJECTIVES, n_rows)
+    neighborhoods = _pick(rng, NEIGHBORHOODS, n_rows)
+    amenity_bits = rng.random((n_rows, len(AMENITIES))) < 0.3
+    amenity_combos = {}
+    amenities = []
+    for row in np.packbits(amenity_bits, axis=1, bitorder="little").view(np.uint16)[:, 0]:
+        text = amenity_combos.get(row)
+        if text is None:
+            text = ",".join(a for i, a in enumerate(AMENITIES) if row >> i & 1)
+            amenity_combos[row] = text
+        amenities.append(text)
+    return pd.DataFrame({
+        "id": np.arange(1, n_rows + 1),
+        "title": _join(kinds, " ", adjectives, " en ", neighborhoods),
+        "location": _pick(rng, LOCATIONS, n_rows),
+        "price": rng.integers(6, 160, n_rows) * 50_000,
+        "beds": rng.integers(1, 6, n_rows),
+        "baths": rng.integers(1, 4, n_rows),
+        "area": rng.integers(25, 400, n_rows),
+        "description": _pick(rng, DESCRIPTIONS, n_rows),
+        "owner_id": owner_ids[rng.integers(0, len(owner_ids), n_rows)],
+        "images": np.where(rng.random(n_rows) < 0.5, "home1.jpg", "user1_prop5_img0.jpg"),
+        "rating": np.round(rng.uniform(3.0, 5.0, n_rows), 1),
+        "amenities": amenities,
+    })
+
+
+def generate(n_rows, out_dir=None, seed=SEED):
+    """Escribe los CSV sintéticos de ``n_rows`` propiedades y devuelve el directorio"""
+    out_dir = out_dir or os.path.join(BENCH_DATA_DIR, str(n_rows))
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    users = generate_users(max(n_rows // USERS_RATIO, 10), rng)
+    owner_ids = users.loc[users["is_owner"], "id"].to_numpy()
+    properties = generate_properties(n_rows, owner_ids, rng)
+    users.to_csv(os.path.join(out_dir, "users.csv"), index=False)
+    properties.to_csv(os.path.join(out_dir, "properties.csv"), index=False)
+    return out_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera CSV sintéticos para los benchmarks")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args(argv)
+    for n_rows in args.rows:
+        print(f"{n_rows} filas → {generate(n_rows, seed=args.seed)}")
+
+
+if __name__ == "__main__":
+    main()
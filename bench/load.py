@@ -0,0 +1,137 @@
+"""Generador de carga local para la API (``python -m kyla.api``).
+
+Abre ``--connections`` conexiones keep-alive y en cada una envía peticiones
+una tras otra durante ``--duration`` segundos, con una mezcla de búsquedas,
+detalles y sugerencias. Informa peticiones por segundo, latencias p50, p95 y
+p99 y los códigos de respuesta. Con ``--revalidate`` cada conexión reenvía el
+último ETag de cada URL (``If-None-Match``), como haría un cliente con caché.
+
+    python -m kyla.api --port 8080 &
+    python -m bench.load --url http://127.0.0.1:8080 --connections 32 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.parse
+from collections import Counter
+
+import numpy as np
+
+from bench.run import SEARCH_QUERIES, SUGGEST_PREFIXES
+
+PRICE_STEPS = [500_000, 1_000_000, 2_000_000, 5_000_000]
+
+
+def build_paths(n_properties, rng, count=500):
+    """Mezcla de URLs: 60 % búsquedas, 30 % detalles, 10 % sugerencias"""
+    paths = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.6:
+            params = {"q": rng.choice(SEARCH_QUERIES), "max_price": rng.choice(PRICE_STEPS)}
+            if rng.random() < 0.3:
+                params["page"] = rng.randrange(3)
+            paths.append("/properties?" + urllib.parse.urlencode(params))
+        elif roll < 0.9:
+            paths.append(f"/properties/{rng.randrange(1, n_properties + 1)}")
+        else:
+            paths.append("/suggest?" + urllib.parse.urlencode({"q": rng.choice(SUGGEST_PREFIXES)}))
+    return paths
+
+
+async def read_response(reader):
+    """``(status, cabeceras, cuerpo)`` de una respuesta con Content-Length"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", "0")))
+    return status, headers, body
+
+
+async def get(host, port, path):
+    """Una petición suelta (sin keep-alive), para leer /health"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    status, _, body = await read_response(reader)
+    writer.close()
+    return status, body
+
+
+async def client(host, port, paths, deadline, revalidate, latencies, statuses, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+            if revalidate and path in etags:
+                request += f"If-None-Match: {etags[path]}\r\n"
+            start = time.perf_counter()
+            writer.write((request + "\r\n").encode())
+            await writer.drain()
+            status, headers, _ = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+            if "etag" in headers:
+                etags[path] = headers["etag"]
+            if headers.get("connection", "").lower() == "close":
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+    finally:
+        writer.close()
+
+
+async def run(url, connections, duration, revalidate, seed):
+    parsed = urllib.parse.urlsplit(url)
+    host, port = parsed.hostname, parsed.port or 80
+    status, body = await get(host, port, "/health")
+    if status != 200:
+        raise SystemExit(f"La API respondió {status} en /health")
+    n_properties = json.loads(body)["properties"]
+    paths = build_paths(n_properties, random.Random(seed))
+
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        client(host, port, paths, deadline, revalidate, latencies, statuses, seed + i)
+        for i in range(connections)
+    ))
+    elapsed = time.perf_counter() - start
+
+    samples = np.asarray(latencies) * 1e3
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de Kyla")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos")
+    parser.add_argument("--revalidate", action="store_true", help="enviar If-None-Match con el último ETag")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.url, args.connections, args.duration, args.revalidate, args.seed))
+    for key, value in result.items():
+        print(f"  {key:<10} {value}")
+
+
+if __name__ == "__main__":
+    main()
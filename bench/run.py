@@ -0,0 +1,266 @@
+"""Benchmarks del núcleo sin interfaz (``kyla.core``).
+
+Para cada tamaño genera (si hace falta) los CSV sintéticos, los migra a un
+store SQLite propio en ``bench/data/<filas>/`` y mide:
+
+- carga: migración, carga en frío (lectura + tipos compactos + instantánea),
+  carga en caliente (instantánea) y construcción del catálogo;
+- búsqueda: latencia de ``Catalog.query`` con texto, precio y servicios, y
+  de los conteos por faceta sobre cada resultado;
+- sugerencias: autocompletado de prefijos (con y sin errores de tipeo);
+- similares: vecinos de una propiedad sin caché;
+- login: búsqueda de usuarios por email;
+- registro: latencia de ``add_user`` por la cola de escritura con varios
+  hilos registrando a la vez (group commit);
+- buzón: primera página y una página profunda del buzón de un dueño.
+
+Los resultados se guardan en ``bench/results/<fecha>-<commit>.json`` para
+compararlos entre commits con ``python -m bench.compare``.
+
+    python -m bench.run --rows 1000 100000
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench.generate import BENCH_DATA_DIR, DEFAULT_SIZES, generate
+from kyla.catalog import Catalog
+from kyla.core import find_user, inbox_page, load_tables
+from kyla.planner import Query
+from kyla.storage import APPLICATION_COLUMNS, STATUS_PENDING, SQLiteStore, migrate_from_csv
+from kyla.writer import WriteQueue
+
+RESULTS_DIR = os.path.join("bench", "results")
+
+SEARCH_QUERIES = ["medellin", "apartamento", "casa poblado", "lof", "cartajena", "vista", "zzz"]
+LOGIN_SAMPLES = 2_000
+INBOX_SAMPLES = 300
+SIMILAR_SAMPLES = 200
+SUGGEST_PREFIXES = ["m", "me", "med", "medel", "medelin", "ca", "casa en", "laur", "cartajena", "zzz"]
+REGISTER_THREADS = 16
+REGISTER_PER_THREAD = 200
+# Solicitudes sintéticas por propiedad
+APPLICATIONS_RATIO = 0.1
+
+# Hasta este tamaño también se mide la búsqueda compatible (sin índice)
+COMPAT_MAX_ROWS = 100_000
+
+
+def percentiles(samples, scale=1.0):
+    samples = np.asarray(samples) * scale
+    return {
+        "p50": round(float(np.percentile(samples, 50)), 4),
+        "p95": round(float(np.percentile(samples, 95)), 4),
+        "n": len(samples),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return out.stdout.strip()
+
+
+def fresh_store(data_dir):
+    """Store vacío en ``data_dir``, borrando la base y la instantánea anteriores"""
+    for name in ("kyla.db", "kyla.db-wal", "kyla.db-shm"):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree(os.path.join(data_dir, ".snapshot"), ignore_errors=True)
+    return SQLiteStore(os.path.join(data_dir, "kyla.db"))
+
+
+def seed_applications(store, properties, rng):
+    """Inserta solicitudes sintéticas repartidas entre los dueños"""
+    n = max(int(len(properties) * APPLICATIONS_RATIO), 1)
+    picks = properties.iloc[rng.integers(0, len(properties), n)]
+    created_at = datetime.datetime(2024, 1, 1).isoformat(timespec="seconds")
+    rows = zip(
+        picks["id"].astype(int).tolist(),
+        picks["owner_id"].astype(int).tolist(),
+        picks["title"].astype(str).tolist(),
+    )
+    columns = APPLICATION_COLUMNS[1:]
+    with store.conn as conn:
+        conn.executemany(
+            f"INSERT INTO applications ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            (
+                (pid, owner, None, title, "Solicitante", "bench@example.com", "", "[]", STATUS_PENDING, created_at)
+                for pid, owner, title in rows
+            ),
+        )
+    return n
+
+
+def bench_search(catalog, repeat, modes):
+    results = {}
+    queries = [Query(text=text, max_price=2_000_000) for text in SEARCH_QUERIES]
+    queries.append(Query(min_price=500_000, max_price=2_000_000))
+    queries.append(Query(min_price=500_000, max_price=2_000_000, min_beds=3, min_rating=4.0))
+    queries.append(Query(max_price=2_000_000, amenities=("parking", "wifi")))
+    facets = []
+    for mode in modes:
+        samples = []
+        for _ in range(repeat):
+            for query in queries:
+                positions, elapsed = timed(catalog.query, query, mode)
+                samples.append(elapsed)
+                if mode == "indexed":
+                    _, elapsed = timed(catalog.facet_counts, positions)
+                    facets.append(elapsed)
+        results[f"search_{mode}_ms"] = percentiles(samples, 1e3)
+    results["facets_ms"] = percentiles(facets, 1e3)
+    return results
+
+
+def bench_suggest(catalog, repeat):
+    samples = []
+    for _ in range(repeat):
+        for prefix in SUGGEST_PREFIXES:
+            _, elapsed = timed(catalog.suggest, prefix)
+            samples.append(elapsed)
+    return {"suggest_us": percentiles(samples, 1e6)}
+
+
+def bench_similar(catalog, rng):
+    samples = []
+    # Posiciones distintas: cada consulta calcula las distancias (no sale de la caché)
+    for pos in rng.choice(len(catalog.properties), min(SIMILAR_SAMPLES, len(catalog.properties)), replace=False):
+        _, elapsed = timed(catalog.similar_index.neighbours, int(pos))
+        samples.append(elapsed)
+    return {"similar_ms": percentiles(samples, 1e3)}
+
+
+def bench_login(catalog, rng):
+    n_users = len(catalog.users)
+    ids = rng.integers(1, n_users + 1, LOGIN_SAMPLES)
+    # Mezcla de aciertos (con mayúsculas y espacios) y fallos
+    emails = [f" USER{i}@example.com " if i % 3 == 0 else f"user{i}@example.com" for i in ids]
+    emails[::10] = [f"nadie{i}@example.com" for i in range(len(emails[::10]))]
+    samples = []
+    for email in emails:
+        _, elapsed = timed(find_user, catalog, email)
+        samples.append(elapsed)
+    return {"login_us": percentiles(samples, 1e6)}
+
+
+def bench_register(store):
+    writer = WriteQueue(store)
+    samples = [[] for _ in range(REGISTER_THREADS)]
+
+    def register(thread):
+        for i in range(REGISTER_PER_THREAD):
+            user = {"name": "Bench", "email": f"registro{thread}_{i}@example.com", "password": "x"}
+            _, elapsed = timed(writer.call, store.add_user, user)
+            samples[thread].append(elapsed)
+
+    threads = [threading.Thread(target=register, args=(t,)) for t in range(REGISTER_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    return {"register_ms": percentiles(sum(samples, []), 1e3)}
+
+
+def bench_inbox(store, owner_ids, rng):
+    first, deep = [], []
+    for owner_id in rng.choice(owner_ids, INBOX_SAMPLES):
+        _, elapsed = timed(inbox_page, store, int(owner_id), 0)
+        first.append(elapsed)
+        _, elapsed = timed(inbox_page, store, int(owner_id), 1_000)
+        deep.append(elapsed)
+    return {"inbox_first_ms": percentiles(first, 1e3), "inbox_last_ms": percentiles(deep, 1e3)}
+
+
+def run_size(n_rows, repeat, seed):
+    data_dir = os.path.join(BENCH_DATA_DIR, str(n_rows))
+    if not os.path.exists(os.path.join(data_dir, "properties.csv")):
+        generate(n_rows, data_dir, seed)
+    rng = np.random.default_rng(seed)
+    snapshot_dir = os.path.join(data_dir, ".snapshot")
+
+    store = fresh_store(data_dir)
+    result = {}
+    _, result["migrate_s"] = timed(migrate_from_csv, store, data_dir)
+    result["applications"] = seed_applications(store, store.properties(), rng)
+    store.close()
+
+    # La instantánea se invalida con el cambio anterior: primera carga en frío
+    _, result["load_cold_s"] = timed(load_tables, store, snapshot_dir)
+    (properties, users, change_seq), result["load_warm_s"] = timed(load_tables, store, snapshot_dir)
+    catalog, result["catalog_build_s"] = timed(Catalog.build, properties, users, change_seq)
+    result["memory_mb"] = round(
+        sum(df.memory_usage(deep=True).sum() for df in (catalog.properties, catalog.users)) / 2**20, 2
+    )
+
+    modes = ["indexed", "compat"] if n_rows <= COMPAT_MAX_ROWS else ["indexed"]
+    result.update(bench_search(catalog, repeat, modes))
+    result.update(bench_suggest(catalog, repeat))
+    result.update(bench_similar(catalog, rng))
+    result.update(bench_login(catalog, rng))
+    owner_ids = users.loc[users["is_owner"], "id"].to_numpy()
+    result.update(bench_inbox(store, owner_ids, rng))
+    result.update(bench_register(store))
+    for key in ("migrate_s", "load_cold_s", "load_warm_s", "catalog_build_s"):
+        result[key] = round(result[key], 4)
+    store.close()
+    return result
+
+
+def save_results(results, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{stamp}-{results['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de carga, búsqueda, login y buzón")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=20, help="repeticiones de cada búsqueda")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-save", action="store_true", help="no guardar el resultado en bench/results")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "sizes": {},
+    }
+    for n_rows in args.rows:
+        print(f"== {n_rows} filas")
+        result = run_size(n_rows, args.repeat, args.seed)
+        results["sizes"][str(n_rows)] = result
+        for key, value in result.items():
+            print(f"  {key:<18} {value}")
+
+    if not args.no_save:
+        print(f"Resultados en {save_results(results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Núcleo de Kyla: estructuras de datos e índices del catálogo."""
@@ -0,0 +1,466 @@
+"""API HTTP de solo lectura (JSON) sobre el mismo núcleo que ``app.py``.
+
+Servidor asyncio sin dependencias externas, pensado para clientes móviles y
+para pruebas de carga (``python -m bench.load``). Carga el catálogo del mismo
+store (y la misma instantánea) que la app y cada segundo aplica los cambios
+nuevos con ``SharedCatalog.refresh``.
+
+    python -m kyla.api --port 8080
+
+Endpoints (solo GET y HEAD):
+
+- ``/health``: estado y versión del catálogo.
+- ``/properties?q=&min_price=&max_price=&min_beds=&min_baths=&min_area=&max_area=&min_rating=&amenities=a,b&exact=1&page=0&page_size=20``
+- ``/properties/<id>``: detalle, con los ids de propiedades similares.
+- ``/suggest?q=``: sugerencias de ubicaciones y títulos.
+- ``/owners/<id>/applications?page=``: buzón del dueño, con autenticación
+  Basic (email y contraseña del dueño).
+- ``/documents/<sha256>``: descarga de un adjunto, solo para el dueño o el
+  solicitante de una solicitud que lo incluya (Basic). El archivo se envía
+  por bloques (``Transfer-Encoding: chunked``) sin cargarlo entero en memoria.
+
+Las conexiones son keep-alive (HTTP/1.1). Las respuestas del catálogo llevan
+un ETag formado por el último cambio del store que refleja el catálogo y la
+URL: un ``If-None-Match`` vigente recibe 304 sin calcular nada, y los cuerpos
+se guardan en una caché LRU que se vacía cuando el catálogo avanza.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import urllib.parse
+from collections import OrderedDict
+from http import HTTPStatus
+
+from kyla.compact import split_amenities
+from kyla.core import clamp_page, find_user, inbox_page, open_catalog, open_default_store
+from kyla.documents import DOCUMENTS_DIR, DocumentStore
+from kyla.planner import Query
+from kyla.querycache import QueryCache
+from kyla.snapshot import SNAPSHOT_DIR
+from kyla.storage import DEFAULT_STORE_URL
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+REFRESH_INTERVAL = 1.0
+KEEP_ALIVE_TIMEOUT = 15
+MAX_HEADER_BYTES = 16 * 1024
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+INBOX_PAGE_SIZE = 10
+RESPONSE_CACHE_ENTRIES = 1024
+# Rutas que no dependen solo del catálogo: sin ETag ni caché
+UNCACHED_PREFIXES = ("/health", "/owners/", "/documents/")
+# URL pública de la API; la app enlaza ahí las descargas de adjuntos
+API_URL_ENV = "KYLA_API_URL"
+
+# Parámetro → (campo de Query, tipo)
+QUERY_PARAMS = {
+    "min_price": ("min_price", int),
+    "max_price": ("max_price", int),
+    "min_beds": ("min_beds", int),
+    "min_baths": ("min_baths", int),
+    "min_area": ("min_area", int),
+    "max_area": ("max_area", int),
+    "min_rating": ("min_rating", float),
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=""):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+
+
+class Download:
+    """Respuesta binaria que se envía por bloques en lugar de JSON"""
+
+    def __init__(self, name, chunks):
+        self.name = name
+        self.chunks = chunks
+
+    def headers(self):
+        return {
+            "Content-Type": "application/octet-stream",
+            "Content-Disposition": f"attachment; filename*=UTF-8''{urllib.parse.quote(self.name)}",
+            "Cache-Control": "private, no-store",
+        }
+
+
+def property_json(prop, similar=None):
+    """Fila del catálogo como dict JSON (tipos nativos de Python)"""
+    data = {
+        "id": int(prop["id"]),
+        "title": str(prop["title"]),
+        "location": str(prop["location"]),
+        "price": int(prop["price"]),
+        "beds": int(prop["beds"]),
+        "baths": int(prop["baths"]),
+        "area": int(prop["area"]),
+        "rating": round(float(prop["rating"]), 2),
+        "description": str(prop["description"]),
+        "amenities": split_amenities(prop["amenities"]),
+        "images": [name for name in str(prop["images"]).split(",") if name],
+        "owner": {
+            "id": int(prop["owner_id"]),
+            "name": str(prop["owner_name"]),
+            "phone": str(prop["owner_phone"]),
+            "rating_avg": round(float(prop["owner_rating_avg"]), 2),
+            "rating_count": int(prop["owner_rating_count"]),
+        },
+    }
+    if similar is not None:
+        data["similar"] = similar
+    return data
+
+
+def application_json(app):
+    return {**app, "created_at": app["created_at"].isoformat()}
+
+
+def _int_param(params, name, default, low=0, high=None):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} debe ser un entero") from None
+    if value < low or (high is not None and value > high):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} fuera de rango")
+    return value
+
+
+def parse_query(params):
+    """``Query`` a partir de los parámetros de ``/properties``"""
+    fields = {"text": params.get("q", "")}
+    for param, (field, cast) in QUERY_PARAMS.items():
+        if params.get(param, "") != "":
+            try:
+                fields[field] = cast(params[param])
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"{param} no es un número válido") from None
+    if params.get("amenities"):
+        fields["amenities"] = tuple(sorted(split_amenities(params["amenities"])))
+    fields["exact"] = params.get("exact", "") in ("1", "true")
+    return Query(**fields)
+
+
+class ResponseCache:
+    """Cuerpos JSON ya serializados por URL, válidos para un ``change_seq`` del catálogo"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.seq = None
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, seq, key):
+        with self._lock:
+            if seq != self.seq:
+                self._items.clear()
+                self.seq = seq
+            body = self._items.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, seq, key, body):
+        with self._lock:
+            if seq != self.seq:
+                return
+            self._items[key] = body
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+class Api:
+    """Rutas de la API y servidor HTTP/1.1 con keep-alive"""
+
+    def __init__(self, store, catalog, documents=None):
+        self.store = store
+        self.catalog = catalog
+        self.documents = documents or DocumentStore()
+        self.query_cache = QueryCache()
+        self.responses = ResponseCache()
+
+    # ----- rutas -----
+
+    def route(self, catalog, path, params, headers):
+        """Datos JSON de una petición sobre la versión ``catalog``; levanta HTTPError"""
+        parts = [p for p in path.split("/") if p]
+        if parts == ["health"]:
+            return self.health(catalog)
+        if parts == ["properties"]:
+            return self.search(catalog, params)
+        if len(parts) == 2 and parts[0] == "properties":
+            return self.detail(catalog, _int_param({"id": parts[1]}, "id", 0))
+        if parts == ["suggest"]:
+            return self.suggest(catalog, params)
+        if len(parts) == 3 and parts[0] == "owners" and parts[2] == "applications":
+            owner_id = _int_param({"id": parts[1]}, "id", 0)
+            return self.inbox(catalog, owner_id, params, headers.get("authorization", ""))
+        if len(parts) == 2 and parts[0] == "documents":
+            return self.document(catalog, parts[1], headers.get("authorization", ""))
+        raise HTTPError(HTTPStatus.NOT_FOUND, "Ruta no encontrada")
+
+    def health(self, catalog):
+        return {
+            "status": "ok",
+            "catalog_version": catalog.version,
+            "change_seq": catalog.change_seq,
+            "properties": len(catalog.properties),
+            "responses": {"hits": self.responses.hits, "misses": self.responses.misses},
+        }
+
+    def search(self, catalog, params):
+        query = parse_query(params)
+        page_size = _int_param(params, "page_size", DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        positions = self.query_cache.lookup(catalog, query)
+        page, total_pages = clamp_page(len(positions), _int_param(params, "page", 0), page_size)
+        start = page * page_size
+        rows = catalog.properties.iloc[positions[start:start + page_size]]
+        return {
+            "total": len(positions),
+            "page": page,
+            "total_pages": total_pages,
+            "results": [property_json(prop) for _, prop in rows.iterrows()],
+        }
+
+    def detail(self, catalog, property_id):
+        prop = catalog.get_property(property_id)
+        if prop is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Propiedad no encontrada")
+        similar = catalog.properties["id"].to_numpy()[catalog.similar(property_id)]
+        return property_json(prop, similar=[int(pid) for pid in similar])
+
+    def suggest(self, catalog, params):
+        suggestions = catalog.suggest(params.get("q", ""))
+        return {
+            "suggestions": [
+                {"kind": col, "value": norm, "text": text, "count": count}
+                for col, norm, text, count in suggestions
+            ]
+        }
+
+    def inbox(self, catalog, owner_id, params, authorization):
+        user = self._authenticate(catalog, authorization)
+        if int(user["id"]) != owner_id or not user["is_owner"]:
+            raise HTTPError(HTTPStatus.FORBIDDEN, "Solo el dueño puede ver su buzón")
+        apps, total, page, total_pages = inbox_page(
+            self.store, owner_id, _int_param(params, "page", 0), INBOX_PAGE_SIZE
+        )
+        return {
+            "total": total,
+            "page": page,
+            "total_pages": total_pages,
+            "applications": [application_json(app) for app in apps],
+        }
+
+    def document(self, catalog, digest, authorization):
+        user = self._authenticate(catalog, authorization)
+        try:
+            exists = self.documents.exists(digest)
+        except ValueError:
+            exists = False
+        names = [
+            name for owner_id, applicant_id, name in (self.store.document_access(digest) if exists else [])
+            if int(user["id"]) in (owner_id, applicant_id)
+        ]
+        # Sin permiso se responde igual que si no existiera
+        if not names:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Documento no encontrado")
+        # El generador abre el archivo en el primer bloque (un HEAD no lo abre)
+        return Download(names[0], self.documents.iter_chunks(digest))
+
+    def _authenticate(self, catalog, authorization):
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "basic" or not token:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Se requiere autenticación")
+        try:
+            email, _, password = base64.b64decode(token).decode("utf-8").partition(":")
+        except ValueError:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Credenciales inválidas") from None
+        user = find_user(catalog, email)
+        if user is None or str(user["password"]) != password.strip():
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Email o contraseña incorrectos")
+        return user
+
+    # ----- HTTP -----
+
+    async def respond(self, method, target, headers):
+        """``(status, cabeceras, cuerpo)`` de una petición ya leída"""
+        if method not in ("GET", "HEAD"):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Solo GET y HEAD")
+        url = urllib.parse.urlsplit(target)
+        params = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+        loop = asyncio.get_running_loop()
+        # Una sola versión del catálogo por petición: el cuerpo, el ETag y la
+        # clave de caché corresponden al mismo change_seq aunque haya un refresh
+        catalog = self.catalog.current()
+        if url.path.startswith(UNCACHED_PREFIXES):
+            data = await loop.run_in_executor(None, self.route, catalog, url.path, params, headers)
+            if isinstance(data, Download):
+                return HTTPStatus.OK, data.headers(), data.chunks
+            return HTTPStatus.OK, {"Cache-Control": "no-store"}, _json_body(data)
+
+        # El ETag depende solo de la versión del catálogo y de la URL: se
+        # compara antes de calcular la respuesta
+        seq = catalog.change_seq
+        key = url.path + "?" + urllib.parse.urlencode(sorted(params.items()))
+        etag = f'"{seq}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"'
+        if etag in headers.get("if-none-match", ""):
+            return HTTPStatus.NOT_MODIFIED, {"ETag": etag, "Cache-Control": "no-cache"}, b""
+        body = self.responses.get(seq, key)
+        if body is not None:
+            return HTTPStatus.OK, {"ETag": etag, "Cache-Control": "no-cache"}, body
+
+        # Las búsquedas pueden tardar: fuera del event loop
+        body = _json_body(await loop.run_in_executor(None, self.route, catalog, url.path, params, headers))
+        self.responses.put(seq, key, body)
+        return HTTPStatus.OK, {"ETag": etag, "Cache-Control": "no-cache"}, body
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._write(writer, "GET", HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                      {}, _error_body("Cabeceras demasiado grandes"), keep_alive=False)
+                    return
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    await self._write(writer, "GET", HTTPStatus.BAD_REQUEST, {},
+                                      _error_body("Petición inválida"), keep_alive=False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", "0"))
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._write(writer, method, HTTPStatus.BAD_REQUEST, {},
+                                      _error_body("Content-Length inválido"), keep_alive=False)
+                    return
+                if length:
+                    # La API no usa cuerpos: se descartan para seguir con la siguiente petición
+                    try:
+                        await reader.readexactly(length)
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        return
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                try:
+                    status, extra, body = await self.respond(method, target, headers)
+                except HTTPError as e:
+                    status, extra, body = e.status, {}, _error_body(e.message)
+                    if e.status == HTTPStatus.UNAUTHORIZED:
+                        extra["WWW-Authenticate"] = 'Basic realm="kyla"'
+                except Exception as e:  # noqa: BLE001 - la conexión sigue viva
+                    status, extra, body = HTTPStatus.INTERNAL_SERVER_ERROR, {}, _error_body(str(e))
+                await self._write(writer, method, status, extra, body, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def _write(self, writer, method, status, extra, body, keep_alive):
+        """Escribe la respuesta; ``body`` son bytes o un generador de bloques (chunked)"""
+        streamed = not isinstance(body, bytes)
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Connection": "keep-alive" if keep_alive else "close",
+            **extra,
+        }
+        if streamed:
+            headers["Transfer-Encoding"] = "chunked"
+        else:
+            headers["Content-Length"] = str(len(body))
+        if keep_alive:
+            headers["Keep-Alive"] = f"timeout={KEEP_ALIVE_TIMEOUT}"
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n")
+        if not streamed:
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+            return
+        try:
+            if method != "HEAD":
+                # Cada bloque se lee del disco fuera del event loop y se envía antes del siguiente
+                loop = asyncio.get_running_loop()
+                while (chunk := await loop.run_in_executor(None, next, body, None)) is not None:
+                    writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    await writer.drain()
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            body.close()
+
+    async def refresh_loop(self, interval=REFRESH_INTERVAL):
+        """Aplica los cambios del store al catálogo cada ``interval`` segundos"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.catalog.refresh)
+            except Exception as e:  # noqa: BLE001 - se reintenta en la próxima vuelta
+                print(f"No se pudo refrescar el catálogo: {e}")
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        # Primera carga antes de aceptar conexiones
+        await asyncio.get_running_loop().run_in_executor(None, self.catalog.current)
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        refresher = asyncio.create_task(self.refresh_loop())
+        print(f"Kyla API en http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            refresher.cancel()
+
+
+def _json_body(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _error_body(message):
+    return _json_body({"error": message})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP de solo lectura de Kyla")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--store", default=None, help=f"URL del store (por defecto {DEFAULT_STORE_URL})")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--documents-dir", default=DOCUMENTS_DIR)
+    args = parser.parse_args(argv)
+
+    store = open_default_store(args.store)
+    api = Api(store, open_catalog(store, args.snapshot_dir), DocumentStore(args.documents_dir))
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
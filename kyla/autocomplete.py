@@ -0,0 +1,179 @@
+"""Sugerencias de búsqueda mientras se escribe (autocompletado).
+
+Las sugerencias son los valores distintos de ``location`` y ``title``,
+normalizados como en ``kyla.search`` y con su popularidad (cuántas
+propiedades tienen ese valor). El índice es un arreglo ordenado de claves:
+cada valor aporta una clave por cada palabra en que empieza un sufijo, así
+"casa en laureles" se encuentra escribiendo "casa", "en" o "laur". Un prefijo
+es un rango de ese arreglo (dos búsquedas binarias) y de él se toman las
+``k`` entradas más populares; para los prefijos de una y dos letras, cuyos
+rangos son los más grandes, el resultado se precalcula al construir.
+
+Elegir una sugerencia lleva a ``Query(exact=True)``: el texto se resuelve
+con las filas del valor exacto, sin puntuación difusa.
+"""
+import bisect
+from collections import defaultdict
+
+import numpy as np
+
+from kyla.search import normalize_text
+
+SUGGEST_COLUMNS = ("location", "title")
+DEFAULT_LIMIT = 8
+# Prefijos hasta este largo tienen su resultado precalculado
+PRECOMPUTED_PREFIX = 2
+# Largo mínimo al recortar una consulta sin sugerencias (p. ej. con un error al final)
+MIN_BACKOFF = 3
+
+
+def _value_counts(properties, column):
+    """{valor normalizado: (texto más común, propiedades)} de una columna"""
+    counts = properties[column].value_counts(sort=False)
+    merged = defaultdict(int)
+    display = {}
+    for raw, count in zip(counts.index.tolist(), counts.tolist()):
+        if not count:
+            continue
+        norm = normalize_text(raw)
+        if not norm:
+            continue
+        merged[norm] += count
+        if norm not in display or count > display[norm][1]:
+            display[norm] = (str(raw).strip(), count)
+    return {norm: (display[norm][0], total) for norm, total in merged.items()}
+
+
+def _suffixes(value):
+    """El valor y cada sufijo que empieza en una palabra"""
+    keys = [value]
+    for i in range(1, len(value)):
+        if value[i - 1] == " " and value[i] != " ":
+            keys.append(value[i:])
+    return keys
+
+
+class PrefixIndex:
+    """Índice de prefijos sobre los valores de ubicación y título"""
+
+    def __init__(self, properties, columns=SUGGEST_COLUMNS):
+        self.columns = tuple(c for c in columns if c in properties.columns)
+        # Una entrada por (columna, valor normalizado)
+        self.entries = []
+        self.display = []
+        counts = []
+        for col in self.columns:
+            for norm, (text, count) in sorted(_value_counts(properties, col).items()):
+                self.entries.append((col, norm))
+                self.display.append(text)
+                counts.append(count)
+        self.entry_ids = {entry: i for i, entry in enumerate(self.entries)}
+        self.counts = np.asarray(counts, dtype=np.int64)
+
+        pairs = sorted((key, eid) for eid, (_, norm) in enumerate(self.entries) for key in _suffixes(norm))
+        self.keys = [key for key, _ in pairs]
+        self.key_entries = np.fromiter((eid for _, eid in pairs), dtype=np.int64, count=len(pairs))
+        self._top = {}
+        self._precompute(set(key[:n] for key in self.keys for n in range(1, PRECOMPUTED_PREFIX + 1)))
+
+    def _range(self, prefix):
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "\uffff", start)
+        return start, end
+
+    def _rank(self, prefix, limit):
+        start, end = self._range(prefix)
+        found = np.unique(self.key_entries[start:end])
+        found = found[self.counts[found] > 0]
+        if len(found) > limit:
+            # Se conservan todos los empates con el k-ésimo: el corte lo decide el orden alfabético
+            counts = self.counts[found]
+            found = found[counts >= np.partition(counts, len(found) - limit)[len(found) - limit]]
+        # Más populares primero; a igual popularidad, orden alfabético
+        ranked = sorted(found.tolist(), key=lambda eid: (-self.counts[eid], *self.entries[eid][::-1]))
+        return np.asarray(ranked[:limit], dtype=np.int64)
+
+    def _precompute(self, prefixes):
+        for prefix in prefixes:
+            self._top[prefix] = self._rank(prefix, DEFAULT_LIMIT)
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        """Ids de entrada que empiezan (o tienen una palabra que empieza) por ``prefix``"""
+        if len(prefix) <= PRECOMPUTED_PREFIX and limit <= DEFAULT_LIMIT:
+            top = self._top.get(prefix)
+            return top[:limit] if top is not None else top
+        return self._rank(prefix, limit)
+
+    def suggest(self, text, limit=DEFAULT_LIMIT):
+        """Sugerencias ``[(columna, valor normalizado, texto, propiedades)]`` para lo escrito.
+
+        Si nada empieza por el texto completo se recorta letra a letra (hasta
+        ``MIN_BACKOFF``), así un error de tipeo al final todavía sugiere algo.
+        """
+        prefix = normalize_text(text)
+        found = None
+        while prefix:
+            found = self.lookup(prefix, limit)
+            if (found is not None and len(found)) or len(prefix) <= MIN_BACKOFF:
+                break
+            prefix = prefix[:-1].rstrip()
+        if found is None:
+            return []
+        return [
+            (*self.entries[eid], self.display[eid], int(self.counts[eid]))
+            for eid in found.tolist()
+        ]
+
+    def updated(self, old_properties, properties, positions):
+        """Índice tras cambiar o añadir las filas ``positions``.
+
+        Se ajustan las popularidades de los valores afectados, las claves de
+        valores nuevos se intercalan en el arreglo ordenado y solo se vuelven a
+        calcular los prefijos cortos que tocan esos valores.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        old = positions[positions < len(old_properties)]
+        delta = defaultdict(int)
+        display = {}
+        for col in self.columns:
+            for raw in old_properties[col].take(old).tolist():
+                delta[(col, normalize_text(raw))] -= 1
+            for raw in properties[col].take(positions).tolist():
+                entry = (col, normalize_text(raw))
+                delta[entry] += 1
+                display.setdefault(entry, str(raw).strip())
+        delta = {entry: d for entry, d in delta.items() if d and entry[1]}
+
+        index = PrefixIndex.__new__(PrefixIndex)
+        index.columns = self.columns
+        index.entries, index.display, index.entry_ids = self.entries, self.display, self.entry_ids
+        index.keys, index.key_entries = self.keys, self.key_entries
+        new_entries = [entry for entry in delta if entry not in self.entry_ids]
+        if new_entries:
+            first = len(self.entries)
+            index.entries = self.entries + new_entries
+            index.display = self.display + [display[entry] for entry in new_entries]
+            index.entry_ids = dict(self.entry_ids)
+            index.entry_ids.update((entry, first + i) for i, entry in enumerate(new_entries))
+            pairs = sorted(
+                (key, first + i) for i, (_, norm) in enumerate(new_entries) for key in _suffixes(norm)
+            )
+            at = [bisect.bisect_right(self.keys, key) for key, _ in pairs]
+            keys, prev = [], 0
+            for (key, _), pos in zip(pairs, at):
+                keys.extend(self.keys[prev:pos])
+                keys.append(key)
+                prev = pos
+            keys.extend(self.keys[prev:])
+            index.keys = keys
+            index.key_entries = np.insert(self.key_entries, at, [eid for _, eid in pairs])
+
+        index.counts = np.zeros(len(index.entries), dtype=np.int64)
+        index.counts[:len(self.counts)] = self.counts
+        for entry, d in delta.items():
+            index.counts[index.entry_ids[entry]] += d
+        index._top = dict(self._top)
+        index._precompute({
+            key[:n] for _, norm in delta for key in _suffixes(norm) for n in range(1, PRECOMPUTED_PREFIX + 1)
+        })
+        return index
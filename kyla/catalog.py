@@ -0,0 +1,215 @@
+"""Catálogo compartido por todo el proceso, con versiones inmutables.
+
+Un ``Catalog`` es una instantánea de solo lectura de usuarios y propiedades
+junto con sus índices. Las sesiones guardan una referencia a la versión
+vigente (nunca una copia) y los escritores publican una versión nueva a
+través de ``SharedCatalog``: la nueva versión comparte con la anterior todo
+lo que no cambió (copy-on-write) y se instala con un único cambio de
+referencia bajo un lock.
+
+Cada catálogo recuerda hasta qué cambio del store refleja (``change_seq``);
+``SharedCatalog.refresh`` aplica solo los cambios posteriores a las tablas y
+a sus índices en lugar de volver a cargar todo.
+"""
+import threading
+
+import numpy as np
+
+from kyla.autocomplete import DEFAULT_LIMIT, PrefixIndex
+from kyla.compact import upsert_rows
+from kyla.facets import AmenityIndex
+from kyla.planner import QueryPlanner
+from kyla.search import SearchIndex
+from kyla.similar import DEFAULT_K, SimilarIndex
+from kyla.users import build_email_index, join_owners, normalize_email, update_email_index
+
+
+class Catalog:
+    """Versión de solo lectura de los datos; no modificar sus DataFrames"""
+
+    def __init__(self, properties, users, search_index, email_index, property_index, planner,
+                 amenity_index, similar_index, prefix_index, change_seq=0, version=0):
+        self.properties = properties
+        self.users = users
+        self.search_index = search_index
+        self.email_index = email_index
+        self.property_index = property_index
+        self.planner = planner
+        self.amenity_index = amenity_index
+        self.similar_index = similar_index
+        self.prefix_index = prefix_index
+        self.change_seq = change_seq
+        self.version = version
+
+    @classmethod
+    def build(cls, properties, users, change_seq=0, version=0):
+        """Construye un catálogo completo (unión de dueños e índices) desde cero"""
+        properties = join_owners(properties, users).reset_index(drop=True)
+        users = users.reset_index(drop=True)
+        property_index = {pid: pos for pos, pid in enumerate(properties["id"].tolist())}
+        search_index = SearchIndex(properties)
+        amenity_index = AmenityIndex(properties)
+        return cls(
+            properties,
+            users,
+            search_index,
+            build_email_index(users),
+            property_index,
+            QueryPlanner(properties, search_index, amenity_index),
+            amenity_index,
+            SimilarIndex(properties, amenity_index),
+            PrefixIndex(properties),
+            change_seq,
+            version,
+        )
+
+    def get_user(self, email):
+        """Fila del usuario con ese email, o None"""
+        pos = self.email_index.get(normalize_email(email))
+        if pos is None:
+            return None
+        return self.users.iloc[pos]
+
+    def get_property(self, property_id):
+        """Fila de la propiedad con ese id, o None"""
+        pos = self.property_index.get(property_id)
+        if pos is None:
+            return None
+        return self.properties.iloc[pos]
+
+    def query(self, query, mode="indexed", within=None):
+        """Posiciones de las propiedades que cumplen una ``Query`` (entre ``within``, si se da)"""
+        return self.planner.execute(query, mode=mode, within=within)
+
+    def facet_counts(self, positions):
+        """{servicio: propiedades de ``positions`` que lo tienen}"""
+        return self.amenity_index.facet_counts(positions)
+
+    def suggest(self, text, limit=DEFAULT_LIMIT):
+        """Sugerencias de ubicaciones y títulos para lo que se lleva escrito"""
+        return self.prefix_index.suggest(text, limit)
+
+    def similar(self, property_id, k=DEFAULT_K):
+        """Posiciones de las ``k`` propiedades más parecidas a ``property_id``"""
+        pos = self.property_index.get(property_id)
+        if pos is None:
+            return np.empty(0, dtype=np.int64)
+        return self.similar_index.neighbours(pos, k)
+
+    def with_changes(self, changes):
+        """Nueva versión con las filas nuevas o modificadas de un ``ChangeSet``.
+
+        Solo se reindexan las filas afectadas; las tablas sin cambios y los
+        índices que no dependen de ellas se comparten con esta versión.
+        Levanta ValueError si los cambios no se pueden aplicar por partes.
+        """
+        users, email_index = self.users, self.email_index
+        properties = self.properties
+        changed = np.empty(0, dtype=np.int64)
+
+        if not changes.users.empty:
+            users, user_positions = upsert_rows(self.users, changes.users)
+            email_index = update_email_index(self.email_index, self.users, users, user_positions)
+            # Dueños que ya tenían propiedades: se actualizan sus columnas owner_*
+            updated_ids = users["id"].to_numpy()[user_positions[user_positions < len(self.users)]]
+            owned = np.flatnonzero(np.isin(np.asarray(properties["owner_id"]), updated_ids))
+            if len(owned):
+                properties, changed = upsert_rows(properties, join_owners(properties.iloc[owned], users))
+
+        if not changes.properties.empty:
+            properties, positions = upsert_rows(properties, join_owners(changes.properties, users))
+            changed = np.union1d(changed, positions)
+
+        search_index, planner, property_index = self.search_index, self.planner, self.property_index
+        amenity_index, similar_index = self.amenity_index, self.similar_index
+        prefix_index = self.prefix_index
+        if len(changed):
+            search_index = self.search_index.updated(properties, changed)
+            amenity_index = self.amenity_index.updated(properties, changed)
+            planner = self.planner.updated(properties, search_index, changed, amenity_index)
+            similar_index = self.similar_index.updated(properties, amenity_index, changed)
+            prefix_index = self.prefix_index.updated(self.properties, properties, changed)
+            appended = changed[changed >= len(self.properties)]
+            if len(appended):
+                property_index = dict(self.property_index)
+                for pos, pid in zip(appended.tolist(), properties["id"].to_numpy()[appended].tolist()):
+                    property_index[pid] = pos
+
+        return Catalog(
+            properties,
+            users,
+            search_index,
+            email_index,
+            property_index,
+            planner,
+            amenity_index,
+            similar_index,
+            prefix_index,
+            changes.seq,
+            self.version,
+        )
+
+
+class SharedCatalog:
+    """Referencia atómica a la versión vigente del catálogo.
+
+    ``loader`` devuelve ``(properties, users, change_seq)`` y se usa en la
+    primera carga y en ``reload``; ``store`` da los cambios para ``refresh``.
+    Las lecturas no toman el lock: leer ``_current`` es atómico.
+    """
+
+    def __init__(self, loader, store=None):
+        self._loader = loader
+        self._store = store
+        self._lock = threading.Lock()
+        self._current = None
+
+    def current(self):
+        catalog = self._current
+        if catalog is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = Catalog.build(*self._loader())
+                catalog = self._current
+        return catalog
+
+    def update(self, change):
+        """Publica ``change(actual)`` como nueva versión y la devuelve.
+
+        El lock serializa a los escritores: cada cambio parte de la última
+        versión publicada y ninguno se pierde.
+        """
+        with self._lock:
+            base = self._current or Catalog.build(*self._loader())
+            catalog = change(base)
+            catalog.version = base.version + 1
+            self._current = catalog
+            return catalog
+
+    def reload(self):
+        """Vuelve a leer todo desde el loader y lo publica como nueva versión"""
+        return self.update(lambda _: Catalog.build(*self._loader()))
+
+    def refresh(self):
+        """Aplica los cambios del store posteriores a la versión vigente.
+
+        Sin cambios no toma el lock ni publica nada (una consulta al store).
+        Si hubo borrados, el registro ya se podó o los cambios no se pueden
+        aplicar por partes, recarga todo como ``reload``.
+        """
+        catalog = self.current()
+        if self._store is None or self._store.last_change() == catalog.change_seq:
+            return catalog
+
+        def apply(base):
+            changes = self._store.changes_since(base.change_seq)
+            if changes.deleted or not changes.complete:
+                return Catalog.build(*self._loader())
+            try:
+                return base.with_changes(changes)
+            except ValueError:
+                return Catalog.build(*self._loader())
+
+        catalog = self.update(apply)
+        self._store.prune_changes(before=catalog.change_seq)
+        return catalog
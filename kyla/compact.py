@@ -0,0 +1,180 @@
+"""Representación compacta en memoria de las tablas del catálogo.
+
+- Columnas de baja cardinalidad (ubicación, dueño, servicios) como categorías:
+  cada valor distinto se guarda una vez y las filas guardan un código entero.
+- Columnas numéricas con tipos fijos de 8, 16 o 32 bits (fijos y no según
+  los datos, para que las filas nuevas quepan). Si un valor no cabe, la
+  columna pasa a int64 en vez de desbordarse en silencio.
+- Servicios como categoría; ``amenity_masks`` los convierte en máscaras de
+  bits de ancho variable (una o más palabras de 64 bits por fila, un bit por
+  servicio del vocabulario) para filtrar y comparar sin parsear texto.
+- Texto libre en cadenas Arrow contiguas, o como categoría si se repite mucho
+  (internado: una copia por valor distinto).
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError:
+    TEXT_DTYPE = object
+
+PROPERTY_DTYPES = {
+    "id": np.int32,
+    "price": np.int32,
+    "beds": np.int16,
+    "baths": np.int16,
+    "area": np.int32,
+    "rating": np.float32,
+}
+USER_DTYPES = {
+    "id": np.int32,
+    "rating_count": np.int32,
+    "rating_avg": np.float32,
+    "is_owner": bool,
+}
+CATEGORY_COLUMNS = ["location", "owner_id", "amenities"]
+PROPERTY_TEXT_COLUMNS = ["title", "description", "images"]
+USER_TEXT_COLUMNS = ["name", "email", "password", "phone"]
+
+# Proporción máxima de valores distintos para guardar texto como categoría
+CATEGORY_RATIO = 0.5
+
+def split_amenities(text):
+    return [a.strip().lower() for a in str(text).split(",") if a.strip()]
+
+
+def amenity_vocabulary(amenities):
+    """Vocabulario ordenado de servicios a partir de la columna categórica"""
+    vocab = set()
+    for text in amenities.cat.categories:
+        vocab.update(split_amenities(text))
+    return sorted(vocab)
+
+
+def mask_words(vocab):
+    """Palabras de 64 bits por fila para un vocabulario (al menos una)"""
+    return max(-(-len(vocab) // 64), 1)
+
+
+def amenity_masks(amenities, vocab):
+    """Máscaras ``(filas, palabras)`` uint64; cada combinación distinta se parsea una sola vez"""
+    bits = {name: (i // 64, np.uint64(1) << np.uint64(i % 64)) for i, name in enumerate(vocab)}
+    per_category = np.zeros((len(amenities.cat.categories) + 1, mask_words(vocab)), dtype=np.uint64)
+    for code, text in enumerate(amenities.cat.categories):
+        for name in split_amenities(text):
+            word, bit = bits[name]
+            per_category[code, word] |= bit
+    # El código -1 (valor nulo) cae en la última fila, que vale 0
+    return per_category[amenities.cat.codes.to_numpy()]
+
+
+def decode_amenities(mask, vocab):
+    """Servicios encendidos en la máscara (fila de palabras) de una propiedad"""
+    return [name for i, name in enumerate(vocab) if int(mask[i // 64]) >> (i % 64) & 1]
+
+
+def fitting_dtype(values, dtype):
+    """``dtype`` si todos los ``values`` caben en él; si no, int64"""
+    if not pd.api.types.is_integer_dtype(dtype) or len(values) == 0:
+        return dtype
+    values = pd.to_numeric(pd.Series(values), errors="coerce")
+    info = np.iinfo(dtype)
+    if values.max() > info.max or values.min() < info.min:
+        return np.int64
+    return dtype
+
+
+def _compact_text(series):
+    if len(series) and series.nunique() / len(series) <= CATEGORY_RATIO:
+        return series.astype("category")
+    return series.astype(TEXT_DTYPE)
+
+
+def compact_properties(properties):
+    """Devuelve una copia de ``properties`` con tipos compactos"""
+    df = properties.copy()
+    for col, dtype in PROPERTY_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(fitting_dtype(df[col], dtype))
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in PROPERTY_TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = _compact_text(df[col])
+    return df
+
+
+def compact_users(users):
+    """Devuelve una copia de ``users`` con tipos compactos"""
+    df = users.copy()
+    for col, dtype in USER_DTYPES.items():
+        df[col] = df[col].astype(fitting_dtype(df[col], dtype))
+    for col in USER_TEXT_COLUMNS:
+        df[col] = df[col].astype(TEXT_DTYPE)
+    return df
+
+
+def memory_report(frames):
+    """Bytes por columna (incluyendo el contenido de las cadenas) de cada tabla"""
+    rows = []
+    for table, df in frames.items():
+        usage = df.memory_usage(deep=True, index=False)
+        for col, nbytes in usage.items():
+            rows.append({"tabla": table, "columna": col, "tipo": str(df[col].dtype), "bytes": int(nbytes)})
+    return pd.DataFrame(rows)
+
+
+def conform(table, rows):
+    """Lleva ``rows`` a los tipos de ``table``; devuelve ``(table, rows)``.
+
+    Los valores nuevos de columnas categóricas se añaden a las categorías de
+    ``table`` (solo cambia la lista de categorías; los códigos se conservan) y
+    una columna entera que no alcanza para los valores nuevos pasa a int64.
+    """
+    table = table.copy(deep=False)
+    rows = rows[list(table.columns)].copy()
+    for col in table.columns:
+        dtype = table[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            missing = pd.Index(rows[col].dropna().unique()).difference(dtype.categories)
+            if len(missing):
+                table[col] = table[col].cat.add_categories(missing)
+                dtype = table[col].dtype
+        elif pd.api.types.is_integer_dtype(dtype) and fitting_dtype(rows[col], dtype) != dtype:
+            table[col] = table[col].astype(np.int64)
+            dtype = table[col].dtype
+        rows[col] = rows[col].astype(dtype)
+    return table, rows
+
+
+def upsert_rows(table, rows, key="id"):
+    """``table`` con ``rows`` reemplazando las filas de igual ``key`` o añadidas al final.
+
+    ``rows`` debe traer todas las columnas de ``table``. Ambas están ordenadas
+    por ``key`` (como las devuelve el store) y las filas nuevas deben tener
+    claves mayores que las existentes; si no, levanta ValueError. Devuelve
+    ``(tabla, posiciones cambiadas)``; ``table`` no se modifica.
+    """
+    table, rows = conform(table, rows)
+    keys = table[key].to_numpy()
+    row_keys = rows[key].to_numpy()
+    pos = np.searchsorted(keys, row_keys)
+    found = pos < len(keys)
+    found[found] = keys[pos[found]] == row_keys[found]
+
+    if found.any():
+        for j, col in enumerate(table.columns):
+            table.iloc[pos[found], j] = rows[col].to_numpy()[found]
+
+    new_rows = rows[~found]
+    if len(new_rows):
+        if len(keys) and new_rows[key].min() <= keys[-1]:
+            raise ValueError("Las filas nuevas deben tener claves mayores que las existentes")
+        table = pd.concat([table, new_rows], ignore_index=True)
+        pos = np.concatenate([pos[found], np.arange(len(keys), len(table))])
+    else:
+        pos = pos[found]
+    return table, np.sort(pos)
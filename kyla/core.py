@@ -0,0 +1,108 @@
+"""Núcleo sin interfaz: carga de datos, búsqueda, login y buzón.
+
+Nada de este módulo importa Streamlit. Los errores de carga se levantan como
+``LoadError`` y es la interfaz (``app.py``) la que decide cómo mostrarlos, de
+modo que el mismo código se puede usar desde scripts y benchmarks.
+"""
+from kyla.catalog import SharedCatalog
+from kyla.compact import compact_properties, compact_users
+from kyla.snapshot import SNAPSHOT_DIR, SnapshotCache
+from kyla.storage import DATA_DIR, StoreError, migrate_from_csv, open_store
+
+# Motivos de LoadError
+MISSING_FILES = "missing_files"
+STORE_FAILED = "store"
+NO_PROPERTIES = "no_properties"
+NO_USERS = "no_users"
+BAD_FORMAT = "format"
+
+
+class LoadError(Exception):
+    """Los datos no se pudieron cargar; ``reason`` es uno de los motivos de arriba"""
+
+    def __init__(self, reason, message=""):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+def open_default_store(url=None, data_dir=DATA_DIR):
+    """Abre el store y migra los CSV de ``data_dir`` la primera vez"""
+    store = open_store(url)
+    migrate_from_csv(store, data_dir)
+    return store
+
+
+def read_tables(store):
+    """Lee y valida las tablas desde el store (camino lento, sin instantánea)"""
+    properties = store.properties()
+    users = store.users()
+
+    # Asegurar que las columnas de texto sean strings
+    for col in ["title", "location", "description", "amenities"]:
+        if col in properties.columns:
+            properties[col] = properties[col].astype(str).fillna("")
+
+    # Asegurar que el email y contraseña sean string
+    users["email"] = users["email"].astype(str).fillna("")
+    users["password"] = users["password"].astype(str)
+
+    # Tipos compactos (categorías, enteros reducidos, máscara de servicios)
+    return compact_properties(properties), compact_users(users)
+
+
+def load_tables(store, snapshot_dir=SNAPSHOT_DIR):
+    """Devuelve ``(properties, users, change_seq)`` usando la instantánea si sigue vigente.
+
+    ``change_seq`` se lee antes que las tablas: un cambio que llegue durante
+    la lectura se vuelve a aplicar en el siguiente refresh (es idempotente).
+    """
+    try:
+        change_seq = store.last_change()
+        # Arranque en caliente: instantánea columnar si las fuentes no cambiaron
+        snapshot = SnapshotCache(store.source_files(), snapshot_dir)
+        frames, state = snapshot.load()
+        if frames is not None:
+            properties, users = frames["properties"], frames["users"]
+        else:
+            properties, users = read_tables(store)
+            snapshot.save({"properties": properties, "users": users}, state)
+    except FileNotFoundError as e:
+        raise LoadError(MISSING_FILES, str(e)) from e
+    except StoreError as e:
+        raise LoadError(STORE_FAILED, str(e)) from e
+    except Exception as e:
+        raise LoadError(BAD_FORMAT, str(e)) from e
+
+    if properties.empty:
+        raise LoadError(NO_PROPERTIES, "No hay propiedades cargadas")
+    if users.empty:
+        raise LoadError(NO_USERS, "No hay usuarios cargados")
+    return properties, users, change_seq
+
+
+def open_catalog(store, snapshot_dir=SNAPSHOT_DIR):
+    """Catálogo compartido que carga (y recarga) sus tablas desde ``store``"""
+    return SharedCatalog(lambda: load_tables(store, snapshot_dir), store)
+
+
+def find_user(catalog, email):
+    """Usuario con ese email (sin distinguir mayúsculas ni espacios), o None"""
+    if not email or email.strip() == "":
+        return None
+    return catalog.get_user(email)
+
+
+def clamp_page(total, page, page_size):
+    """``(página válida, número de páginas)`` para ``total`` elementos"""
+    total_pages = max((total - 1) // page_size + 1, 1)
+    return min(max(page, 0), total_pages - 1), total_pages
+
+
+def inbox_page(store, owner_id, page=0, page_size=10):
+    """Una página del buzón del dueño: ``(solicitudes, total, página, páginas)``"""
+    total = store.count_applications_for_owner(owner_id)
+    page, total_pages = clamp_page(total, page, page_size)
+    if total == 0:
+        return [], 0, page, total_pages
+    applications = store.applications_for_owner(owner_id, limit=page_size, offset=page * page_size)
+    return applications, total, page, total_pages
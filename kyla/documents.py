@@ -0,0 +1,74 @@
+"""Almacén de documentos adjuntos direccionado por contenido.
+
+Cada archivo se guarda una sola vez con el nombre del SHA-256 de su
+contenido (``objects/ab/abcdef...``): si un solicitante envía el mismo
+documento a varios dueños, todas las solicitudes apuntan al mismo objeto.
+Los archivos se escriben y se leen por bloques, sin tener el contenido
+completo en memoria; la escritura va a un temporal que se renombra de forma
+atómica, así que nunca queda un objeto a medio escribir con su nombre final.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+DOCUMENTS_DIR = "data/documents"
+CHUNK_SIZE = 256 * 1024
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class DocumentStore:
+    """Objetos inmutables en disco identificados por su SHA-256"""
+
+    def __init__(self, root=DOCUMENTS_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, digest):
+        if not _DIGEST.match(str(digest)):
+            raise ValueError(f"Identificador de documento inválido: {digest!r}")
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, stream, chunk_size=CHUNK_SIZE):
+        """Copia ``stream`` por bloques y devuelve ``(sha256, tamaño)``.
+
+        Si ya había un objeto con ese contenido, el temporal se descarta.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while chunk := stream.read(chunk_size):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            hexdigest = digest.hexdigest()
+            path = self.path(hexdigest)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return hexdigest, size
+
+    def open(self, digest):
+        """Archivo binario abierto para leer el documento"""
+        return open(self.path(digest), "rb")
+
+    def iter_chunks(self, digest, chunk_size=CHUNK_SIZE):
+        """Contenido del documento por bloques, para respuestas en streaming"""
+        with self.open(digest) as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
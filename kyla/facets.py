@@ -0,0 +1,141 @@
+"""Índice de servicios (amenities) como bitsets para filtros y conteos por faceta.
+
+Por cada servicio del vocabulario se guarda un bitset de todas las filas
+(un bit por propiedad, empaquetado en palabras de 64 bits). Un conjunto de
+resultados se convierte una vez en bitset y el conteo de cada faceta es un
+AND palabra a palabra más un popcount, sin recorrer filas ni parsear texto.
+
+El índice también guarda la máscara de servicios de cada fila (``masks``,
+``(filas, palabras)``): el vocabulario no tiene tope, cada 64 servicios
+añaden una palabra por fila.
+"""
+import numpy as np
+
+from kyla.compact import amenity_masks, amenity_vocabulary, mask_words
+
+if hasattr(np, "bitwise_count"):
+    def bit_counts(words):
+        """Bits encendidos de cada palabra uint64"""
+        return np.bitwise_count(words)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def bit_counts(words):
+        """Bits encendidos de cada palabra uint64"""
+        words = np.ascontiguousarray(words, dtype=np.uint64)
+        counts = _BYTE_COUNTS[words.reshape(-1).view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+        return counts.reshape(words.shape)
+
+
+def _popcount(words):
+    return int(bit_counts(words).sum(dtype=np.int64))
+
+
+def to_bitset(positions, size):
+    """Bitset (palabras uint64) con los bits de ``positions`` encendidos"""
+    flags = np.zeros(-(-size // 64) * 64, dtype=bool)
+    flags[positions] = True
+    return np.packbits(flags, bitorder="little").view(np.uint64)
+
+
+def from_bitset(bitset, size):
+    """Posiciones (ordenadas) de los bits encendidos"""
+    flags = np.unpackbits(bitset.view(np.uint8), bitorder="little", count=size)
+    return np.flatnonzero(flags)
+
+
+class AmenityIndex:
+    """Bitset por servicio sobre las filas del catálogo"""
+
+    def __init__(self, properties):
+        self.size = len(properties)
+        if "amenities" in properties.columns:
+            self.vocab = amenity_vocabulary(properties["amenities"])
+            self.masks = amenity_masks(properties["amenities"], self.vocab)
+        else:
+            self.vocab = []
+            self.masks = np.zeros((self.size, 1), dtype=np.uint64)
+        self.bitsets = {name: to_bitset(self._rows_with(bit), self.size) for bit, name in enumerate(self.vocab)}
+        self.totals = {name: _popcount(bitset) for name, bitset in self.bitsets.items()}
+
+    def _rows_with(self, bit, positions=None):
+        """Posiciones (o máscara booleana sobre ``positions``) de las filas con el servicio ``bit``"""
+        word = self.masks[:, bit // 64] if positions is None else self.masks[positions, bit // 64]
+        has = word & (np.uint64(1) << np.uint64(bit % 64)) != 0
+        return np.flatnonzero(has) if positions is None else has
+
+    def updated(self, properties, positions):
+        """Índice tras cambiar o añadir las filas ``positions`` de ``properties``.
+
+        Si el vocabulario no cambió solo se reescriben los bits de esas filas;
+        si apareció un servicio nuevo (cambian todos los bits) se reconstruye.
+        """
+        if amenity_vocabulary(properties["amenities"]) != self.vocab:
+            return AmenityIndex(properties)
+        index = AmenityIndex.__new__(AmenityIndex)
+        index.size = len(properties)
+        index.vocab = self.vocab
+        positions = np.asarray(positions, dtype=np.int64)
+        index.masks = np.zeros((index.size, self.masks.shape[1]), dtype=np.uint64)
+        index.masks[:len(self.masks)] = self.masks[:index.size]
+        index.masks[positions] = amenity_masks(properties["amenities"].take(positions), self.vocab)
+        words = -(-index.size // 64)
+        word_ids = positions // 64
+        bits = np.uint64(1) << (positions % 64).astype(np.uint64)
+        index.bitsets = {}
+        for bit, name in enumerate(self.vocab):
+            bitset = np.zeros(words, dtype=np.uint64)
+            bitset[:len(self.bitsets[name])] = self.bitsets[name]
+            has = index._rows_with(bit, positions)
+            # Apagar los bits de las filas tocadas y encender los que correspondan
+            np.bitwise_and.at(bitset, word_ids, ~bits)
+            np.bitwise_or.at(bitset, word_ids[has], bits[has])
+            index.bitsets[name] = bitset
+        index.totals = {name: _popcount(bitset) for name, bitset in index.bitsets.items()}
+        return index
+
+    def required_mask(self, names):
+        """Máscara (una fila de palabras) con los bits de ``names``; ValueError si alguno no existe"""
+        mask = np.zeros(mask_words(self.vocab), dtype=np.uint64)
+        for name in names:
+            bit = self.vocab.index(name)
+            mask[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return mask
+
+    def count(self, names):
+        """Filas que tienen todos los servicios ``names``"""
+        if not names:
+            return self.size
+        if any(name not in self.bitsets for name in names):
+            return 0
+        combined = self.bitsets[names[0]]
+        for name in names[1:]:
+            combined = combined & self.bitsets[name]
+        return _popcount(combined)
+
+    def positions(self, names):
+        """Posiciones de las filas con todos los servicios ``names``"""
+        if any(name not in self.bitsets for name in names):
+            return np.empty(0, dtype=np.int64)
+        combined = self.bitsets[names[0]]
+        for name in names[1:]:
+            combined = combined & self.bitsets[name]
+        return from_bitset(combined, self.size)
+
+    def filter(self, positions, names):
+        """Las ``positions`` que tienen todos los servicios ``names``"""
+        if any(name not in self.bitsets for name in names):
+            return positions[:0]
+        required = self.required_mask(names)
+        words = np.flatnonzero(required)
+        if len(words) == 1:
+            word, bits = words[0], required[words[0]]
+            return positions[(self.masks[positions, word] & bits) == bits]
+        return positions[((self.masks[positions][:, words] & required[words]) == required[words]).all(axis=1)]
+
+    def facet_counts(self, positions):
+        """{servicio: filas de ``positions`` que lo tienen}, por AND + popcount"""
+        if len(positions) == self.size:
+            return dict(self.totals)
+        result = to_bitset(positions, self.size)
+        return {name: _popcount(bitset & result) for name, bitset in self.bitsets.items()}
@@ -0,0 +1,227 @@
+"""Variantes precalculadas (miniatura y detalle) de las imágenes de propiedades.
+
+Las variantes se generan fuera del camino de renderizado, en un pool de
+procesos, y se registran en un manifiesto JSON indexado por nombre de archivo
+y mtime. Al renderizar solo se compara el mtime de la imagen con el manifiesto
+en memoria y los bytes se sirven desde una caché LRU acotada por tamaño, sin
+decodificar la imagen original por fila. Una imagen nueva o reemplazada
+después del arranque se genera la primera vez que se pide.
+"""
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+IMAGES_DIR = "assets/images"
+CACHE_DIR = "assets/.cache"
+MANIFEST_NAME = "manifest.json"
+
+# Ancho en píxeles de cada variante (el doble del ancho mostrado, para pantallas HiDPI)
+VARIANTS = {"thumb": 240, "detail": 600}
+JPEG_QUALITY = 85
+
+# Por debajo de este número de imágenes pendientes no compensa arrancar el pool
+MIN_POOL_JOBS = 4
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def render_variants(src_path, cache_dir, name, variants=VARIANTS):
+    """Genera las variantes de una imagen y devuelve {variante: archivo}"""
+    files = {}
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        for variant, width in variants.items():
+            resized = img.copy()
+            resized.thumbnail((width, width * 4))
+            file_name = f"{name}.{variant}.jpg"
+            tmp_path = os.path.join(cache_dir, file_name + ".tmp")
+            resized.save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True)
+            os.replace(tmp_path, os.path.join(cache_dir, file_name))
+            files[variant] = file_name
+    return files
+
+
+class BytesLRU:
+    """Caché LRU de bytes acotada por tamaño total"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ImagePipeline:
+    """Manifiesto de variantes de imagen más caché de bytes en memoria"""
+
+    def __init__(self, images_dir=IMAGES_DIR, cache_dir=CACHE_DIR, cache_bytes=DEFAULT_CACHE_BYTES):
+        self.images_dir = images_dir
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        self.cache = BytesLRU(cache_bytes)
+        self._lock = threading.Lock()
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Un manifiesto con otras variantes (p. ej. tras cambiar VARIANTS) se descarta
+        if any(set(entry.get("files", {})) != set(VARIANTS) for entry in manifest.values()):
+            return {}
+        return manifest
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def refresh(self, workers=None):
+        """Sincroniza el manifiesto con la carpeta de imágenes.
+
+        Solo se regeneran las imágenes nuevas o con mtime distinto; las que ya
+        no existen salen del manifiesto. Devuelve cuántas se generaron.
+        """
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            try:
+                entries = [e for e in os.scandir(self.images_dir) if e.is_file()]
+            except FileNotFoundError:
+                entries = []
+
+            manifest = {}
+            pending = []
+            for entry in entries:
+                mtime_ns = entry.stat().st_mtime_ns
+                current = self.manifest.get(entry.name)
+                if current is not None and current["mtime_ns"] == mtime_ns:
+                    manifest[entry.name] = current
+                else:
+                    pending.append((entry.name, entry.path, mtime_ns))
+
+            for name, files in self._render(pending, workers):
+                manifest[name] = files
+
+            for name, current in self.manifest.items():
+                if name not in manifest:
+                    for file_name in current["files"].values():
+                        try:
+                            os.remove(os.path.join(self.cache_dir, file_name))
+                        except OSError:
+                            pass
+
+            if manifest != self.manifest:
+                self._write_manifest(manifest)
+            self.manifest = manifest
+            return len(pending)
+
+    def _render(self, pending, workers):
+        """Genera las variantes pendientes; las imágenes ilegibles se omiten"""
+        if len(pending) < MIN_POOL_JOBS:
+            results = []
+            for name, path, mtime_ns in pending:
+                try:
+                    results.append((name, mtime_ns, render_variants(path, self.cache_dir, name)))
+                except OSError:
+                    continue
+        else:
+            # spawn: no se hereda el estado de los hilos del servidor
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [
+                    (name, mtime_ns, pool.submit(render_variants, path, self.cache_dir, name))
+                    for name, path, mtime_ns in pending
+                ]
+                results = []
+                for name, mtime_ns, future in futures:
+                    try:
+                        results.append((name, mtime_ns, future.result()))
+                    except OSError:
+                        continue
+        return [(name, {"mtime_ns": mtime_ns, "files": files}) for name, mtime_ns, files in results]
+
+    def _update(self, name, path, mtime_ns):
+        """Genera las variantes de una sola imagen y la registra en el manifiesto"""
+        with self._lock:
+            entry = self.manifest.get(name)
+            if entry is not None and entry["mtime_ns"] == mtime_ns:
+                return entry
+            os.makedirs(self.cache_dir, exist_ok=True)
+            try:
+                entry = {"mtime_ns": mtime_ns, "files": render_variants(path, self.cache_dir, name)}
+            except OSError:
+                return None
+            manifest = dict(self.manifest)
+            manifest[name] = entry
+            self._write_manifest(manifest)
+            self.manifest = manifest
+            return entry
+
+    def get(self, name, variant="thumb"):
+        """Bytes de una variante, o None si la imagen no existe o no es legible.
+
+        Una imagen que falta en el manifiesto o cuyo mtime cambió (subida o
+        reemplazada después de ``refresh``) se genera aquí, una sola vez.
+        """
+        name = name.strip()
+        if not name or os.path.basename(name) != name:
+            return None
+        path = os.path.join(self.images_dir, name)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        entry = self.manifest.get(name)
+        if entry is None or entry["mtime_ns"] != mtime_ns:
+            entry = self._update(name, path, mtime_ns)
+            if entry is None:
+                return None
+        key = (name, entry["mtime_ns"], variant)
+        data = self.cache.get(key)
+        if data is None:
+            try:
+                with open(os.path.join(self.cache_dir, entry["files"][variant]), "rb") as f:
+                    data = f.read()
+            except OSError:
+                return None
+            self.cache.put(key, data)
+        return data
@@ -0,0 +1,269 @@
+"""Importación masiva de propiedades desde un CSV.
+
+El archivo se lee por bloques de ``--chunk-size`` filas con el módulo ``csv``
+(nunca entero en memoria) y cada bloque se valida y normaliza en un pool de
+procesos: precio y campos numéricos, que ``owner_id`` sea un arrendador
+existente y que cada imagen exista en ``assets/images``. A diferencia de
+``read_csv_data``, una fila inválida no se descarta en silencio: cada problema
+queda en un reporte CSV (línea, columna, valor y motivo).
+
+Las filas válidas se insertan en el store bloque a bloque, en orden y una
+transacción por bloque. Como mucho hay ``2 × workers`` bloques en vuelo, así
+que la memoria no depende del tamaño del archivo. Los ids del CSV se ignoran:
+el store asigna ids nuevos.
+
+    python -m kyla.importer propiedades.csv --report rechazos.csv
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from kyla.compact import PROPERTY_DTYPES, split_amenities
+from kyla.images import IMAGES_DIR
+from kyla.storage import DEFAULT_STORE_URL, PROPERTY_COLUMNS, open_store
+
+DEFAULT_CHUNK_SIZE = 20_000
+# Bloques en vuelo por proceso del pool
+CHUNKS_PER_WORKER = 2
+
+IMPORT_COLUMNS = PROPERTY_COLUMNS[1:]
+REQUIRED_COLUMNS = ("title", "location", "price", "owner_id")
+TEXT_COLUMNS = ("title", "location", "description")
+# columna: (entero, mínimo, máximo, obligatoria); vacía y opcional vale 0.
+# Los máximos caben en los tipos compactos del catálogo (kyla.compact)
+NUMERIC_RULES = {
+    "price": (True, 1, int(np.iinfo(PROPERTY_DTYPES["price"]).max), True),
+    "beds": (True, 0, 100, False),
+    "baths": (True, 0, 100, False),
+    "area": (True, 0, min(1_000_000, int(np.iinfo(PROPERTY_DTYPES["area"]).max)), False),
+    "rating": (False, 0, 5, False),
+    "owner_id": (True, 1, 2**53, True),
+}
+REPORT_COLUMNS = ["line", "column", "value", "reason"]
+
+# Arrendadores e imágenes válidos; los fija _init_worker en cada proceso
+_owners = np.empty(0, dtype=np.int64)
+_images = frozenset()
+
+
+def _init_worker(owners, images):
+    global _owners, _images
+    _owners = np.asarray(owners, dtype=np.int64)
+    _images = frozenset(images)
+
+
+def _numeric(raw, column):
+    """Valores numéricos de una columna de texto; ``$``, espacios y ``_`` se ignoran en el precio"""
+    if column == "price":
+        raw = raw.str.replace(r"[$\s_]", "", regex=True)
+    return pd.to_numeric(raw, errors="coerce")
+
+
+def validate_chunk(header, lines, rows):
+    """Valida un bloque de filas crudas (listas de textos) del CSV.
+
+    Devuelve ``(filas válidas, problemas)``: las filas son tuplas en el orden
+    de ``IMPORT_COLUMNS`` acompañadas de su línea, y cada problema es
+    ``(línea, columna, valor, motivo)``.
+    """
+    frame = pd.DataFrame(rows, columns=header, dtype=object)
+    lines = np.asarray(lines, dtype=np.int64)
+    problems = []
+    bad = np.zeros(len(frame), dtype=bool)
+
+    def reject(mask, column, raw, reason):
+        mask = np.asarray(mask, dtype=bool)
+        for i in np.flatnonzero(mask).tolist():
+            problems.append((int(lines[i]), column, raw[i], reason))
+        bad[mask] = True
+
+    def column_text(column):
+        if column not in frame:
+            return pd.Series("", index=frame.index, dtype=object)
+        return frame[column].fillna("").astype(str).str.strip()
+
+    out = {}
+    for column in TEXT_COLUMNS:
+        raw = column_text(column)
+        if column in REQUIRED_COLUMNS:
+            reject(raw == "", column, raw.tolist(), "vacío")
+        out[column] = raw.tolist()
+
+    invalid = {}
+    for column, (integer, minimum, maximum, required) in NUMERIC_RULES.items():
+        raw = column_text(column)
+        texts = raw.tolist()
+        values = _numeric(raw, column).to_numpy(dtype=float, na_value=np.nan)
+        empty = (raw == "").to_numpy()
+        missing = ~np.isfinite(values)
+        values = np.where(missing, 0, values)
+        checks = [(missing & ~empty, "no es un número")]
+        if required:
+            checks.append((empty, "vacío"))
+        if integer:
+            checks.append((~missing & (values % 1 != 0), "no es un número entero"))
+        checks.append((~missing & (values < minimum), f"menor que {minimum}"))
+        checks.append((~missing & (values > maximum), f"mayor que {maximum}"))
+        invalid[column] = np.zeros(len(frame), dtype=bool)
+        for mask, reason in checks:
+            # Un solo motivo por celda: el primero que aplica
+            mask = mask & ~invalid[column]
+            reject(mask, column, texts, reason)
+            invalid[column] |= mask
+        out[column] = values
+
+    owners = out["owner_id"].astype(np.int64)
+    found = np.minimum(np.searchsorted(_owners, owners), max(len(_owners) - 1, 0))
+    known = _owners[found] == owners if len(_owners) else np.zeros(len(owners), dtype=bool)
+    reject(~known & ~invalid["owner_id"], "owner_id", column_text("owner_id").tolist(),
+           "no es un arrendador registrado")
+
+    images = []
+    for i, text in enumerate(column_text("images").tolist()):
+        names = [name.strip() for name in text.split(",") if name.strip()]
+        missing_images = [name for name in names if name not in _images]
+        if missing_images:
+            problems.append((int(lines[i]), "images", text, f"imagen inexistente: {', '.join(missing_images)}"))
+            bad[i] = True
+        images.append(",".join(names))
+    out["images"] = images
+    # Servicios normalizados como en kyla.compact, sin repetidos; cada combinación se parsea una vez
+    amenities = {}
+    out["amenities"] = [
+        amenities.get(text) or amenities.setdefault(text, ",".join(dict.fromkeys(split_amenities(text))))
+        for text in column_text("amenities").tolist()
+    ]
+
+    keep = np.flatnonzero(~bad)
+    columns = []
+    for column in IMPORT_COLUMNS:
+        values = out[column]
+        if isinstance(values, list):
+            columns.append([values[i] for i in keep.tolist()])
+        elif column == "rating":
+            columns.append(values[keep].tolist())
+        else:
+            columns.append(values[keep].astype(np.int64).tolist())
+    return list(zip(lines[keep].tolist(), *columns)), problems
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Itera ``(encabezado, líneas, filas, problemas)`` del CSV por bloques.
+
+    Las filas con un número de campos distinto al del encabezado no se
+    validan: salen directamente como problemas del bloque.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        lines, rows, problems = [], [], []
+        line = reader.line_num
+        for row in reader:
+            # Línea donde empieza la fila (un campo entre comillas puede ocupar varias)
+            start, line = line + 1, reader.line_num
+            if not "".join(row).strip():
+                continue
+            if len(row) != len(header):
+                problems.append((start, "", "", f"tiene {len(row)} campos; se esperaban {len(header)}"))
+            else:
+                lines.append(start)
+                rows.append(row)
+            if len(rows) + len(problems) >= chunk_size:
+                yield header, lines, rows, problems
+                lines, rows, problems = [], [], []
+        if rows or problems:
+            yield header, lines, rows, problems
+
+
+def import_properties(store, path, report_path, chunk_size=DEFAULT_CHUNK_SIZE, workers=None,
+                      images_dir=IMAGES_DIR, dry_run=False):
+    """Importa ``path`` al store y escribe los problemas en ``report_path``.
+
+    Devuelve un resumen ``{"filas", "importadas", "rechazadas", "problemas"}``.
+    Con ``dry_run`` solo valida y reporta.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = {name.strip() for name in next(csv.reader(f), [])}
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias en {path}: {', '.join(missing)}")
+
+    owners = sorted(store.owner_ids())
+    try:
+        images = [entry.name for entry in os.scandir(images_dir) if entry.is_file()]
+    except FileNotFoundError:
+        images = []
+    workers = workers or os.cpu_count() or 1
+    summary = {"filas": 0, "importadas": 0, "rechazadas": 0, "problemas": 0}
+
+    with open(report_path, "w", newline="", encoding="utf-8") as report_file:
+        report = csv.writer(report_file)
+        report.writerow(REPORT_COLUMNS)
+
+        def finish(read_problems, result):
+            valid, problems = result
+            problems = read_problems + problems
+            rows = [dict(zip(IMPORT_COLUMNS, values)) for _, *values in valid]
+            if rows and not dry_run:
+                store.add_properties(rows)
+            problems.sort()
+            report.writerows(problems)
+            rejected = len({line for line, *_ in problems})
+            summary["filas"] += len(rows) + rejected
+            summary["importadas"] += len(rows)
+            summary["rechazadas"] += rejected
+            summary["problemas"] += len(problems)
+
+        chunks = read_chunks(path, chunk_size)
+        if workers <= 1:
+            _init_worker(owners, images)
+            for header, lines, rows, read_problems in chunks:
+                finish(read_problems, validate_chunk(header, lines, rows))
+        else:
+            # spawn: no se hereda el estado de los hilos del proceso que importa
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker, initargs=(owners, images)) as pool:
+                pending = deque()
+                for header, lines, rows, read_problems in chunks:
+                    pending.append((read_problems, pool.submit(validate_chunk, header, lines, rows)))
+                    if len(pending) >= workers * CHUNKS_PER_WORKER:
+                        read_problems, future = pending.popleft()
+                        finish(read_problems, future.result())
+                while pending:
+                    read_problems, future = pending.popleft()
+                    finish(read_problems, future.result())
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importación masiva de propiedades desde un CSV")
+    parser.add_argument("csv", help="archivo con las columnas de data/properties.csv")
+    parser.add_argument("--report", default=None, help="CSV de filas rechazadas (por defecto <csv>.rechazos.csv)")
+    parser.add_argument("--store", default=None, help=f"URL del store (por defecto {DEFAULT_STORE_URL})")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="procesos de validación (1 = sin pool)")
+    parser.add_argument("--images-dir", default=IMAGES_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="solo validar y escribir el reporte")
+    args = parser.parse_args(argv)
+
+    report = args.report or os.path.splitext(args.csv)[0] + ".rechazos.csv"
+    store = open_store(args.store)
+    start = time.perf_counter()
+    summary = import_properties(store, args.csv, report, args.chunk_size, args.workers,
+                                args.images_dir, args.dry_run)
+    for key, value in summary.items():
+        print(f"  {key:<10} {value}")
+    print(f"  {'segundos':<10} {time.perf_counter() - start:.1f}")
+    print(f"Reporte de rechazos: {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Medición por etapas de cada rerun de la app.
+
+Cada rerun abre una ``Trace`` y envuelve sus etapas (carga, login, búsqueda,
+imágenes, renderizado...) en ``trace.stage(nombre)``. Las etapas se pueden
+anidar: cada una registra solo su tiempo propio, sin el de las etapas hijas,
+así que la suma de etapas es el total del rerun. Al terminar, la traza se
+entrega a ``Metrics``, que guarda una ventana móvil por (página, etapa) para
+calcular p50/p95 y, opcionalmente, añade una línea JSON por rerun a un log.
+"""
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Reruns recientes que se conservan por página y etapa
+DEFAULT_WINDOW = 500
+
+# Si está definida, cada rerun se añade como una línea JSON a este archivo
+LOG_ENV = "KYLA_METRICS_LOG"
+
+
+class Trace:
+    """Tiempos de las etapas de un rerun"""
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self._start = time.perf_counter()
+        self._stack = []
+        self.stages = collections.defaultdict(float)
+        self.finished = False
+
+    @contextmanager
+    def stage(self, name):
+        # [tiempo de las etapas hijas] de la etapa en curso
+        frame = [0.0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            self.stages[name] += elapsed - frame[0]
+            if self._stack:
+                self._stack[-1][0] += elapsed
+
+    def finish(self, page, **fields):
+        """Cierra la traza y la entrega a ``Metrics``; ``fields`` van al log"""
+        total = time.perf_counter() - self._start
+        self.finished = True
+        self._metrics.record(page, dict(self.stages), total, fields)
+
+
+class Metrics:
+    """Ventanas móviles de tiempos por página y etapa, compartidas por el proceso"""
+
+    def __init__(self, window=DEFAULT_WINDOW, log_path=None):
+        self.window = window
+        self.log_path = log_path if log_path is not None else os.environ.get(LOG_ENV)
+        self._lock = threading.Lock()
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._recent = collections.deque(maxlen=self.window)
+
+    def trace(self):
+        return Trace(self)
+
+    def record(self, page, stages, total, fields=None):
+        entry = {
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "page": page,
+            "total_ms": round(total * 1e3, 3),
+            "stages_ms": {name: round(seconds * 1e3, 3) for name, seconds in stages.items()},
+            **(fields or {}),
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            for name, seconds in stages.items():
+                self._samples[(page, name)].append(seconds)
+            self._samples[(page, "total")].append(total)
+            self._recent.append(line)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def summary(self):
+        """p50/p95 en milisegundos por página y etapa"""
+        with self._lock:
+            samples = {key: np.array(values) for key, values in self._samples.items()}
+        rows = []
+        for (page, stage), values in sorted(samples.items()):
+            rows.append({
+                "página": page,
+                "etapa": stage,
+                "reruns": len(values),
+                "p50 (ms)": round(float(np.percentile(values, 50)) * 1e3, 2),
+                "p95 (ms)": round(float(np.percentile(values, 95)) * 1e3, 2),
+            })
+        return pd.DataFrame(rows, columns=["página", "etapa", "reruns", "p50 (ms)", "p95 (ms)"])
+
+    def export_jsonl(self):
+        """Las trazas recientes como JSON Lines"""
+        with self._lock:
+            return "\n".join(self._recent) + ("\n" if self._recent else "")
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._recent.clear()
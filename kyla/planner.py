@@ -0,0 +1,185 @@
+"""Planificador de consultas sobre el catálogo de propiedades.
+
+Cada filtro numérico tiene un ``SortedIndex`` (valores ordenados + posiciones)
+que responde rangos con búsqueda binaria y cuenta sus filas en O(log n). El
+planificador usa esas cuentas (y una estimación del índice de texto) para
+empezar por el predicado más selectivo; los demás solo se evalúan sobre los
+candidatos que quedan, con operaciones vectorizadas sobre columnas enteras.
+Los servicios requeridos se resuelven con los bitsets de ``AmenityIndex``.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Columna → (campo mínimo, campo máximo) de Query
+RANGE_FILTERS = {
+    "price": ("min_price", "max_price"),
+    "beds": ("min_beds", None),
+    "baths": ("min_baths", None),
+    "area": ("min_area", "max_area"),
+    "rating": ("min_rating", None),
+}
+
+# Columnas enteras: la tabla las guarda compactas, los índices en int64
+INT_COLUMNS = {"price": np.int64, "beds": np.int64, "baths": np.int64, "area": np.int64}
+
+
+@dataclass(frozen=True)
+class Query:
+    """Filtros del listado; None significa sin límite"""
+
+    text: str = ""
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    min_beds: Optional[int] = None
+    min_baths: Optional[int] = None
+    min_area: Optional[int] = None
+    max_area: Optional[int] = None
+    min_rating: Optional[float] = None
+    # Servicios requeridos (todos), ordenados
+    amenities: Tuple[str, ...] = ()
+    # El texto es un valor exacto (una sugerencia elegida): sin búsqueda difusa
+    exact: bool = False
+
+    def bounds(self, column):
+        low_field, high_field = RANGE_FILTERS[column]
+        low = getattr(self, low_field) if low_field else None
+        high = getattr(self, high_field) if high_field else None
+        return low, high
+
+
+def _column_values(properties, column):
+    values = properties[column].to_numpy()
+    dtype = INT_COLUMNS.get(column)
+    return values.astype(dtype) if dtype is not None else values.astype(np.float64)
+
+
+class SortedIndex:
+    """Valores de una columna ordenados, con la posición de fila de cada uno"""
+
+    def __init__(self, values):
+        self.values = values
+        self.order = np.argsort(values, kind="stable")
+        self.sorted = values[self.order]
+
+    def _bounds(self, low, high):
+        start = 0 if low is None else np.searchsorted(self.sorted, low, side="left")
+        end = len(self.sorted) if high is None else np.searchsorted(self.sorted, high, side="right")
+        return start, max(start, end)
+
+    def updated(self, values, positions):
+        """Nuevo índice con ``values`` (la columna completa actualizada) tras
+        cambiar o añadir las filas ``positions``: se quitan sus entradas viejas
+        y las nuevas se intercalan con búsqueda binaria, sin reordenar todo.
+        """
+        index = SortedIndex.__new__(SortedIndex)
+        index.values = values
+        keep = ~np.isin(self.order, positions)
+        order = self.order[keep]
+        sorted_values = self.sorted[keep]
+        new_order = positions[np.argsort(values[positions], kind="stable")]
+        new_sorted = values[new_order]
+        at = np.searchsorted(sorted_values, new_sorted, side="right")
+        index.order = np.insert(order, at, new_order)
+        index.sorted = np.insert(sorted_values, at, new_sorted)
+        return index
+
+    def count(self, low, high):
+        start, end = self._bounds(low, high)
+        return int(end - start)
+
+    def range(self, low, high):
+        """Posiciones (ordenadas) con ``low <= valor <= high``"""
+        start, end = self._bounds(low, high)
+        return np.sort(self.order[start:end])
+
+    def mask(self, positions, low, high):
+        """Máscara de ``positions`` cuyos valores caen en el rango"""
+        values = self.values[positions]
+        mask = np.ones(len(positions), dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+
+class QueryPlanner:
+    """Ejecuta ``Query`` sobre las propiedades de un catálogo"""
+
+    def __init__(self, properties, search_index, amenity_index=None):
+        self.size = len(properties)
+        self.search_index = search_index
+        self.amenity_index = amenity_index
+        self.indexes = {}
+        for column in RANGE_FILTERS:
+            if column in properties.columns:
+                self.indexes[column] = SortedIndex(_column_values(properties, column))
+
+    def updated(self, properties, search_index, positions, amenity_index=None):
+        """Planificador para ``properties`` tras cambiar o añadir ``positions``"""
+        planner = QueryPlanner.__new__(QueryPlanner)
+        planner.size = len(properties)
+        planner.search_index = search_index
+        planner.amenity_index = amenity_index
+        positions = np.asarray(positions, dtype=np.int64)
+        planner.indexes = {
+            column: index.updated(_column_values(properties, column), positions)
+            for column, index in self.indexes.items()
+        }
+        return planner
+
+    def plan(self, query):
+        """Predicados activos ordenados de más a menos selectivo: [(nombre, filas estimadas)]"""
+        steps = []
+        for column, index in self.indexes.items():
+            low, high = query.bounds(column)
+            if low is None and high is None:
+                continue
+            steps.append((column, index.count(low, high)))
+        if query.text.strip():
+            if query.exact:
+                steps.append(("exact", self.search_index.exact_count(query.text)))
+            else:
+                steps.append(("text", self.search_index.estimate(query.text)))
+        if query.amenities and self.amenity_index is not None:
+            steps.append(("amenities", self.amenity_index.count(list(query.amenities))))
+        steps.sort(key=lambda step: step[1])
+        return steps
+
+    def execute(self, query, mode="indexed", within=None):
+        """Posiciones de fila (en orden del catálogo) que cumplen todos los filtros.
+
+        Con ``within`` (posiciones ordenadas) solo se evalúan esas filas.
+        """
+        steps = self.plan(query)
+        if within is not None:
+            within = np.asarray(within, dtype=np.int64)
+            if not steps or len(within) == 0:
+                return within
+        elif not steps:
+            return np.arange(self.size)
+
+        positions = within
+        for name, _ in steps:
+            if name == "text":
+                positions = self.search_index.search(query.text, mode=mode, within=positions)
+            elif name == "exact":
+                positions = self.search_index.exact(query.text, within=positions)
+            elif name == "amenities":
+                names = list(query.amenities)
+                if positions is None:
+                    positions = self.amenity_index.positions(names)
+                else:
+                    positions = self.amenity_index.filter(positions, names)
+            else:
+                low, high = query.bounds(name)
+                index = self.indexes[name]
+                if positions is None:
+                    positions = index.range(low, high)
+                else:
+                    positions = positions[index.mask(positions, low, high)]
+            if len(positions) == 0:
+                break
+        return positions
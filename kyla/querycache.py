@@ -0,0 +1,90 @@
+"""Caché de resultados de búsqueda compartida por todas las sesiones.
+
+La clave es la ``Query`` con el texto normalizado (así "Medellín" y
+" medellin" comparten entrada) y los servicios ordenados, más el modo de
+búsqueda, y cada entrada pertenece a una versión del catálogo. Cuando llega
+una consulta con una versión más nueva (se escribió un usuario o una
+propiedad) la caché se vacía entera: los resultados viejos no se vuelven a
+servir.
+
+Los resultados son arreglos de posiciones de solo lectura, compartidos tal
+cual entre sesiones; la caché está acotada en entradas y en bytes.
+"""
+import dataclasses
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from kyla.search import normalize_text
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(query, mode):
+    normalized = dataclasses.replace(
+        query, text=normalize_text(query.text), amenities=tuple(sorted(query.amenities))
+    )
+    return normalized, mode
+
+
+class QueryCache:
+    """LRU de ``Catalog.query`` ligada a la versión vigente del catálogo"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _clear(self, version):
+        self._items.clear()
+        self.size = 0
+        self.version = version
+
+    def _put(self, key, positions):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= old.nbytes
+        self._items[key] = positions
+        self.size += positions.nbytes
+        while self._items and (len(self._items) > self.max_entries or self.size > self.max_bytes):
+            _, evicted = self._items.popitem(last=False)
+            self.size -= evicted.nbytes
+
+    def lookup(self, catalog, query, mode="indexed"):
+        """Posiciones que cumplen ``query`` en ``catalog``, desde la caché si es posible"""
+        key = cache_key(query, mode)
+        with self._lock:
+            if self.version is None or catalog.version > self.version:
+                self._clear(catalog.version)
+            if catalog.version == self.version:
+                positions = self._items.get(key)
+                if positions is not None:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return positions
+            self.misses += 1
+
+        # Se calcula fuera del lock: una consulta lenta no bloquea las demás
+        positions = np.asarray(catalog.query(key[0], mode=mode), dtype=np.int32)
+        positions.setflags(write=False)
+        with self._lock:
+            # Una sesión con una versión vieja no llena la caché
+            if catalog.version == self.version and positions.nbytes <= self.max_bytes:
+                self._put(key, positions)
+        return positions
+
+    def stats(self):
+        return {
+            "versión": self.version,
+            "entradas": len(self._items),
+            "bytes": self.size,
+            "aciertos": self.hits,
+            "fallos": self.misses,
+        }
@@ -0,0 +1,130 @@
+"""Búsquedas guardadas y coincidencias con propiedades nuevas.
+
+Un usuario guarda la ``Query`` del inicio (en JSON, en el store). En lugar de
+volver a ejecutar cada búsqueda sobre todo el catálogo, ``SearchMatcher``
+compara solo las propiedades creadas o modificadas desde la última pasada
+(según el registro de cambios) contra todas las búsquedas guardadas a la
+vez: el texto de cada consulta distinta se busca una sola vez en el índice
+normalizado, restringido a esas filas, y los demás filtros se evalúan sobre
+lo que queda. Las coincidencias se guardan en el store y el perfil muestra
+las que el usuario aún no vio. Si parte del rango ya no está en el registro
+(se podó), se compara todo el catálogo.
+"""
+import dataclasses
+import json
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from kyla.planner import Query
+from kyla.search import normalize_text
+
+
+def query_to_json(query):
+    """JSON con los filtros de ``query`` que no están en su valor por defecto"""
+    defaults = Query()
+    fields = {
+        field.name: getattr(query, field.name)
+        for field in dataclasses.fields(Query)
+        if getattr(query, field.name) != getattr(defaults, field.name)
+    }
+    return json.dumps(fields, ensure_ascii=False, sort_keys=True, default=int)
+
+
+def query_from_json(text):
+    """``Query`` guardada con ``query_to_json``; ignora campos desconocidos"""
+    names = {field.name for field in dataclasses.fields(Query)}
+    fields = {key: value for key, value in json.loads(text).items() if key in names}
+    if "amenities" in fields:
+        fields["amenities"] = tuple(sorted(fields["amenities"]))
+    return Query(**fields)
+
+
+def describe_query(query):
+    """Resumen corto de una búsqueda para mostrarla en el perfil"""
+    parts = [f"“{query.text.strip()}”"] if query.text.strip() else []
+    if query.min_price or query.max_price:
+        parts.append(f"${query.min_price or 0:,} – ${query.max_price:,}" if query.max_price
+                     else f"desde ${query.min_price:,}")
+    if query.min_beds:
+        parts.append(f"{query.min_beds}+ hab")
+    if query.min_baths:
+        parts.append(f"{query.min_baths}+ baños")
+    if query.min_area or query.max_area:
+        parts.append(f"{query.min_area or 0}–{query.max_area or '∞'} m²")
+    if query.min_rating:
+        parts.append(f"⭐ {query.min_rating:g}+")
+    if query.amenities:
+        parts.append(", ".join(query.amenities))
+    return " · ".join(parts) or "Todas las propiedades"
+
+
+def match_properties(catalog, searches, property_ids):
+    """Pares ``(search_id, property_id)`` de ``property_ids`` que cumplen cada búsqueda.
+
+    ``searches`` son dicts del store (``id``, ``user_id``, ``query``). Las
+    propiedades del propio usuario no cuentan como coincidencias.
+    """
+    positions = np.sort(np.fromiter(
+        (pos for pos in map(catalog.property_index.get, property_ids) if pos is not None), dtype=np.int64
+    ))
+    if len(positions) == 0 or not searches:
+        return []
+
+    # Búsquedas agrupadas por texto normalizado y por el resto de filtros
+    by_text = defaultdict(lambda: defaultdict(list))
+    for search in searches:
+        query = query_from_json(search["query"])
+        by_text[normalize_text(query.text)][dataclasses.replace(query, text="")].append(search)
+
+    ids = catalog.properties["id"].to_numpy()
+    owners = catalog.properties["owner_id"].to_numpy()
+    matches = []
+    for text, groups in by_text.items():
+        hits = catalog.search_index.search(text, within=positions) if text else positions
+        for query, group in groups.items():
+            found = catalog.query(query, within=hits)
+            for search in group:
+                own = owners[found] == search["user_id"]
+                matches.extend((search["id"], pid) for pid in ids[found[~own]].tolist())
+    return matches
+
+
+class SearchMatcher:
+    """Compara los cambios del store con las búsquedas guardadas, una vez por cambio"""
+
+    def __init__(self, store):
+        self.store = store
+        self.seq = None
+        self._lock = threading.Lock()
+
+    def run(self, catalog):
+        """Registra las coincidencias de los cambios hasta ``catalog.change_seq``; devuelve cuántas"""
+        if self.seq is not None and catalog.change_seq <= self.seq:
+            return 0
+        with self._lock:
+            until = catalog.change_seq
+            since = self.store.matched_seq()
+            searches = self.store.saved_searches()
+            if since is None:
+                # Primera pasada: desde la búsqueda guardada más antigua
+                since = min((s["created_seq"] for s in searches), default=until)
+            if since >= until:
+                self.seq = max(since, until)
+                return 0
+            changed, first = self.store.changed_properties(since, until)
+            if first is None or first > since + 1:
+                # Faltan cambios: se revisan todas las propiedades. Las que no
+                # están en el registro pudieron cambiar hasta justo antes de ``first``
+                horizon = until if first is None else min(first - 1, until)
+                changed = {pid: changed.get(pid, horizon) for pid in catalog.properties["id"].tolist()}
+            created = {search["id"]: search["created_seq"] for search in searches}
+            # Una búsqueda solo recibe propiedades que cambiaron después de guardarla
+            matches = [
+                (search_id, pid) for search_id, pid in match_properties(catalog, searches, list(changed))
+                if changed[pid] > created[search_id]
+            ]
+            self.store.record_search_matches(matches, until)
+            self.seq = until
+            return len(matches)
@@ -0,0 +1,279 @@
+"""Búsqueda difusa sobre el catálogo con índice invertido de trigramas y tokens."""
+import bisect
+import copy
+import difflib
+import math
+from collections import defaultdict
+
+import numpy as np
+
+SEARCH_COLUMNS = ("title", "location")
+DEFAULT_THRESHOLD = 0.4
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def normalize_text(text):
+    text = str(text).lower().strip()
+    replacements = {
+        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
+        'ñ': 'n', 'ü': 'u'
+    }
+    for a, b in replacements.items():
+        text = text.replace(a, b)
+    return text
+
+
+def is_match(query, text, threshold=DEFAULT_THRESHOLD):
+    if not query or not text:
+        return False
+    q = normalize_text(query)
+    t = normalize_text(text)
+    if q in t:
+        return True
+    score = difflib.SequenceMatcher(None, q, t).ratio()
+    return score >= threshold
+
+
+def trigrams(text):
+    """Conjunto de trigramas (sin relleno) de un texto ya normalizado"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _fuzzy_score(matcher, threshold):
+    """Aplica los filtros baratos de difflib antes de calcular ratio()"""
+    return (
+        matcher.real_quick_ratio() >= threshold
+        and matcher.quick_ratio() >= threshold
+        and matcher.ratio() >= threshold
+    )
+
+
+class SearchIndex:
+    """Índice de búsqueda construido una sola vez al cargar las propiedades.
+
+    Cada valor distinto de las columnas de texto se normaliza una vez y se
+    guarda con las posiciones de fila en que aparece. Sobre esos valores se
+    construyen dos índices invertidos:
+
+    - trigramas → valores, para obtener candidatos de consultas de 3+ letras;
+    - tokens ordenados, para consultas más cortas que un trigrama (prefijo).
+
+    Modos de búsqueda:
+
+    - ``"indexed"``: solo puntúa los candidatos que comparten algún trigrama
+      (o prefijo de token) con la consulta.
+    - ``"compat"``: reproduce exactamente la semántica anterior de
+      ``is_match`` (subcadena o ``ratio >= threshold``) sobre todos los
+      valores distintos.
+    """
+
+    MODES = ("indexed", "compat")
+
+    def __init__(self, df, columns=SEARCH_COLUMNS):
+        self.columns = tuple(c for c in columns if c in df.columns)
+        self.size = len(df)
+
+        value_ids = {}
+        values = []
+        rows = []
+        # Columnas pre-normalizadas: id de valor por fila
+        self.row_values = {}
+        for col in self.columns:
+            ids = np.empty(self.size, dtype=np.int32)
+            for pos, raw in enumerate(df[col].tolist()):
+                norm = normalize_text(raw)
+                vid = value_ids.get(norm)
+                if vid is None:
+                    vid = value_ids[norm] = len(values)
+                    values.append(norm)
+                    rows.append([])
+                rows[vid].append(pos)
+                ids[pos] = vid
+            self.row_values[col] = ids
+
+        self.values = values
+        self._value_ids = value_ids
+        self._rows = [np.unique(np.asarray(r, dtype=np.int64)) for r in rows]
+
+        postings = defaultdict(list)
+        tokens = defaultdict(set)
+        for vid, value in enumerate(values):
+            for tri in trigrams(value):
+                postings[tri].append(vid)
+            for token in value.split():
+                tokens[token].add(vid)
+        self._trigrams = {t: np.asarray(v, dtype=np.int32) for t, v in postings.items()}
+        # Filas cubiertas por cada trigrama, para estimar selectividad
+        row_counts = np.array([len(r) for r in self._rows], dtype=np.int64)
+        self._trigram_rows = {t: int(row_counts[v].sum()) for t, v in self._trigrams.items()}
+        self._tokens = sorted(tokens)
+        self._token_values = [tokens[t] for t in self._tokens]
+
+    def updated(self, df, positions):
+        """Nueva versión del índice con las filas ``positions`` de ``df`` reindexadas.
+
+        ``df`` es la tabla completa ya actualizada (las filas nuevas van al
+        final). Todo lo que no cambia se comparte con este índice; los valores
+        que se quedan sin filas siguen en el índice, con posiciones vacías.
+        """
+        index = copy.copy(self)
+        index.size = len(df)
+        index.values = list(self.values)
+        index._value_ids = dict(self._value_ids)
+        rows = list(self._rows)
+        positions = np.asarray(positions, dtype=np.int64)
+
+        index.row_values = {}
+        removed = defaultdict(set)
+        added = defaultdict(set)
+        new_vids = []
+        for col in self.columns:
+            old_ids = self.row_values[col]
+            ids = np.empty(index.size, dtype=np.int32)
+            ids[:self.size] = old_ids
+            for pos, raw in zip(positions.tolist(), df[col].iloc[positions].tolist()):
+                norm = normalize_text(raw)
+                vid = index._value_ids.get(norm)
+                if vid is None:
+                    vid = index._value_ids[norm] = len(index.values)
+                    index.values.append(norm)
+                    rows.append(_EMPTY)
+                    new_vids.append(vid)
+                if pos < self.size:
+                    removed[int(old_ids[pos])].add(pos)
+                added[vid].add(pos)
+                ids[pos] = vid
+            index.row_values[col] = ids
+
+        # Una fila sigue en un valor si otra columna todavía lo tiene
+        for vid in set(removed) | set(added):
+            gone = [p for p in removed.get(vid, ()) if all(ids[p] != vid for ids in index.row_values.values())]
+            current = np.setdiff1d(rows[vid], np.asarray(gone, dtype=np.int64), assume_unique=True)
+            rows[vid] = np.union1d(current, np.fromiter(added.get(vid, ()), dtype=np.int64))
+        index._rows = rows
+
+        # Trigramas y tokens: solo se tocan las entradas de valores afectados
+        index._trigrams = dict(self._trigrams)
+        index._trigram_rows = dict(self._trigram_rows)
+        new_postings = defaultdict(list)
+        for vid in new_vids:
+            for tri in trigrams(index.values[vid]):
+                new_postings[tri].append(vid)
+        for tri, vids in new_postings.items():
+            old = index._trigrams.get(tri, np.empty(0, dtype=np.int32))
+            index._trigrams[tri] = np.concatenate([old, np.asarray(vids, dtype=np.int32)])
+        for vid in set(removed) | set(added):
+            delta = len(rows[vid]) - (len(self._rows[vid]) if vid < len(self._rows) else 0)
+            if delta:
+                for tri in trigrams(index.values[vid]):
+                    index._trigram_rows[tri] = index._trigram_rows.get(tri, 0) + delta
+
+        if new_vids:
+            tokens = dict(zip(self._tokens, self._token_values))
+            for vid in new_vids:
+                for token in index.values[vid].split():
+                    tokens[token] = tokens.get(token, set()) | {vid}
+            index._tokens = sorted(tokens)
+            index._token_values = [tokens[t] for t in index._tokens]
+        return index
+
+    def normalized(self, col):
+        """Textos normalizados de una columna, en el orden de las filas"""
+        return [self.values[vid] for vid in self.row_values[col]]
+
+    def search(self, query, mode="indexed", threshold=DEFAULT_THRESHOLD, within=None):
+        """Devuelve las posiciones de fila (ordenadas) que coinciden con la consulta.
+
+        Con ``within`` (posiciones ordenadas) solo se puntúan los valores que
+        aparecen en esas filas y el resultado es un subconjunto de ellas.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de búsqueda desconocido: {mode}")
+        q = normalize_text(query)
+        if not q:
+            return np.arange(self.size, dtype=np.int64) if within is None else within
+
+        if mode == "compat":
+            candidates = np.arange(len(self.values))
+        else:
+            candidates = self._candidates(q)
+
+        if within is None:
+            return self._positions(self._scan(q, candidates.tolist(), threshold))
+
+        present = np.unique(np.concatenate([ids[within] for ids in self.row_values.values()]))
+        candidates = np.intersect1d(candidates, present, assume_unique=True)
+        matches = np.asarray(self._scan(q, candidates.tolist(), threshold), dtype=np.int32)
+        mask = np.zeros(len(within), dtype=bool)
+        for ids in self.row_values.values():
+            mask |= np.isin(ids[within], matches)
+        return within[mask]
+
+    def exact(self, query, within=None):
+        """Posiciones cuyo valor normalizado es exactamente ``query``, sin puntuar nada"""
+        vid = self._value_ids.get(normalize_text(query))
+        rows = _EMPTY if vid is None else self._rows[vid]
+        if within is None:
+            return rows
+        return within[np.isin(within, rows, assume_unique=True)]
+
+    def exact_count(self, query):
+        vid = self._value_ids.get(normalize_text(query))
+        return 0 if vid is None else len(self._rows[vid])
+
+    def estimate(self, query):
+        """Cota superior de filas candidatas de una consulta, sin puntuar nada"""
+        q = normalize_text(query)
+        if len(q) < 3:
+            return self.size
+        return min(self.size, sum(self._trigram_rows.get(t, 0) for t in trigrams(q)))
+
+    def _candidates(self, q):
+        if len(q) < 3:
+            # Demasiado corta para trigramas: prefijo sobre los tokens
+            start = bisect.bisect_left(self._tokens, q)
+            end = bisect.bisect_left(self._tokens, q + "\uffff")
+            found = set()
+            for vids in self._token_values[start:end]:
+                found.update(vids)
+            return np.array(sorted(found), dtype=np.int64)
+
+        postings = [self._trigrams[t] for t in trigrams(q) if t in self._trigrams]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(postings))
+
+    def _scan(self, q, candidates, threshold):
+        # Fuera de este rango de longitudes ratio() no puede alcanzar el umbral
+        # (cotas redondeadas hacia afuera: solo descartan, nunca aceptan)
+        lq = len(q)
+        if threshold > 0:
+            min_len = math.floor(lq * threshold / (2 - threshold))
+            max_len = math.ceil(lq * (2 - threshold) / threshold)
+        else:
+            min_len, max_len = 0, math.inf
+
+        # Mismo orden de argumentos que is_match: (consulta, texto)
+        matcher = difflib.SequenceMatcher(None, q)
+        matches = []
+        for vid in candidates:
+            value = self.values[vid]
+            if not value:
+                continue
+            if q in value:
+                matches.append(vid)
+                continue
+            if not min_len <= len(value) <= max_len:
+                continue
+            matcher.set_seq2(value)
+            if _fuzzy_score(matcher, threshold):
+                matches.append(vid)
+        return matches
+
+    def _positions(self, vids):
+        if not vids:
+            return _EMPTY
+        if len(vids) == 1:
+            return self._rows[vids[0]]
+        return np.unique(np.concatenate([self._rows[v] for v in vids]))
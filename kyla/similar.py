@@ -0,0 +1,170 @@
+"""Recomendación de propiedades similares.
+
+Cada propiedad se describe con una matriz de rasgos numéricos normalizados
+(precio y área en escala logarítmica, habitaciones, baños y calificación,
+llevados a media 0 y desviación 1) más dos rasgos que no se expanden en
+columnas: el código de ubicación (una penalización si difiere) y la máscara
+de servicios (distancia de Hamming sobre las máscaras de ``AmenityIndex``).
+
+Las distancias a una propiedad se calculan por lotes de filas con NumPy y se
+quedan las ``k`` menores con ``argpartition``. Con catálogos grandes solo se
+comparan las propiedades de la misma ubicación (índice aproximado por
+particiones). Los vecinos se guardan por propiedad y, cuando cambian
+propiedades, solo se invalidan las entradas a las que esos cambios afectan.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from kyla.facets import bit_counts
+
+# Columna → transformación antes de normalizar
+NUMERIC_FEATURES = {"price": "log", "beds": None, "baths": None, "area": "log", "rating": None}
+
+# Peso de una ubicación distinta y de la fracción de servicios distintos
+LOCATION_WEIGHT = 4.0
+AMENITY_WEIGHT = 2.0
+
+DEFAULT_K = 4
+BATCH_ROWS = 262_144
+# Desde este tamaño se compara solo con la misma ubicación
+APPROX_MIN_ROWS = 200_000
+CACHE_ENTRIES = 4096
+
+
+def _raw_features(properties):
+    columns = []
+    for col, transform in NUMERIC_FEATURES.items():
+        values = properties[col].to_numpy(dtype=np.float64)
+        if transform == "log":
+            values = np.log1p(np.maximum(values, 0))
+        columns.append(values)
+    return np.column_stack(columns)
+
+
+def _top_k(distances, positions, k):
+    if len(distances) > k:
+        keep = np.argpartition(distances, k)[:k]
+        distances, positions = distances[keep], positions[keep]
+    order = np.argsort(distances, kind="stable")
+    return positions[order], distances[order]
+
+
+class SimilarIndex:
+    """Matriz de rasgos del catálogo y caché de vecinos por posición de fila"""
+
+    def __init__(self, properties, amenity_index, approximate=None):
+        raw = _raw_features(properties)
+        self.mean = raw.mean(axis=0)
+        self.std = raw.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        self._init_rows(properties, raw, amenity_index)
+        self.approximate = len(properties) >= APPROX_MIN_ROWS if approximate is None else approximate
+        self.partitions = self._partitions() if self.approximate else None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _init_rows(self, properties, raw, amenity_index):
+        self.size = len(properties)
+        self.features = ((raw - self.mean) / self.std).astype(np.float32)
+        self.locations = properties["location"].cat.codes.to_numpy().astype(np.int32)
+        # Máscaras compartidas con el índice de servicios (no se copian)
+        self.masks = amenity_index.masks
+        self.amenity_scale = AMENITY_WEIGHT / max(len(amenity_index.vocab), 1)
+
+    def _partitions(self):
+        order = np.argsort(self.locations, kind="stable")
+        codes, starts = np.unique(self.locations[order], return_index=True)
+        return dict(zip(codes.tolist(), np.split(order, starts[1:])))
+
+    def distances(self, pos, candidates):
+        """Distancias de la fila ``pos`` a las filas ``candidates``"""
+        diff = self.features[candidates] - self.features[pos]
+        dist = np.einsum("ij,ij->i", diff, diff)
+        dist += LOCATION_WEIGHT * (self.locations[candidates] != self.locations[pos])
+        differing = bit_counts(self.masks[candidates] ^ self.masks[pos])
+        dist += self.amenity_scale * (differing[:, 0] if differing.shape[1] == 1 else differing.sum(axis=1))
+        return dist
+
+    def _candidates(self, pos):
+        if self.partitions is not None:
+            return self.partitions.get(int(self.locations[pos]))
+        return None
+
+    def _search(self, pos, k):
+        candidates = self._candidates(pos)
+        total = self.size if candidates is None else len(candidates)
+        best_pos, best_dist = [], []
+        for start in range(0, total, BATCH_ROWS):
+            if candidates is None:
+                batch = np.arange(start, min(start + BATCH_ROWS, total))
+            else:
+                batch = candidates[start:start + BATCH_ROWS]
+            batch = batch[batch != pos]
+            top_pos, top_dist = _top_k(self.distances(pos, batch), batch, k)
+            best_pos.append(top_pos)
+            best_dist.append(top_dist)
+        if not best_pos:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return _top_k(np.concatenate(best_dist), np.concatenate(best_pos), k)
+
+    def neighbours(self, pos, k=DEFAULT_K):
+        """Posiciones de las ``k`` propiedades más parecidas a la fila ``pos``"""
+        with self._lock:
+            entry = self._cache.get(pos)
+            if entry is not None and len(entry[0]) >= k:
+                self._cache.move_to_end(pos)
+                return entry[0][:k]
+        positions, dist = self._search(pos, k)
+        with self._lock:
+            self._cache[pos] = (positions, dist)
+            while len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return positions
+
+    def updated(self, properties, amenity_index, changed):
+        """Índice tras cambiar o añadir las filas ``changed`` de ``properties``.
+
+        La normalización (media y desviación) se conserva de la construcción.
+        De la caché se descartan las propiedades que cambiaron, las que tenían
+        un vecino que cambió y aquellas a las que una fila cambiada ahora
+        quedaría más cerca que su último vecino; las demás siguen valiendo.
+        """
+        index = SimilarIndex.__new__(SimilarIndex)
+        index.mean, index.std = self.mean, self.std
+        index._init_rows(properties, _raw_features(properties), amenity_index)
+        index.approximate = self.approximate
+        changed = np.asarray(changed, dtype=np.int64)
+        if self.partitions is not None:
+            index.partitions = dict(self.partitions)
+            old = changed[changed < self.size]
+            moved = old[self.locations[old] != index.locations[old]]
+            for code in np.unique(self.locations[moved]).tolist():
+                index.partitions[code] = np.setdiff1d(index.partitions[code], moved)
+            new_rows = np.union1d(moved, changed[changed >= self.size])
+            for code in np.unique(index.locations[new_rows]).tolist():
+                rows = new_rows[index.locations[new_rows] == code]
+                index.partitions[code] = np.union1d(index.partitions.get(code, np.empty(0, np.int64)), rows)
+        else:
+            index.partitions = None
+
+        index._cache = OrderedDict()
+        index._lock = threading.Lock()
+        if index.amenity_scale != self.amenity_scale:
+            # Cambió el vocabulario de servicios: todas las distancias cambian
+            return index
+        with self._lock:
+            entries = list(self._cache.items())
+        changed_set = set(changed.tolist())
+        for pos, (positions, dist) in entries:
+            if pos in changed_set or changed_set.intersection(positions.tolist()):
+                continue
+            if len(dist) and len(changed):
+                candidates = changed
+                if index.partitions is not None:
+                    candidates = changed[index.locations[changed] == index.locations[pos]]
+                if len(candidates) and index.distances(pos, candidates).min() < dist[-1]:
+                    continue
+            index._cache[pos] = (positions, dist)
+        return index
@@ -0,0 +1,139 @@
+"""Instantánea columnar en disco de las tablas ya cargadas y validadas.
+
+Guarda cada DataFrame como un archivo Feather (Arrow IPC) sin comprimir, que
+se abre con memory-map en los arranques siguientes en lugar de volver a leer
+y validar las tablas. La instantánea se invalida por las fuentes de las que
+salió: primero se compara (mtime, tamaño) de cada archivo y, si cambiaron,
+un hash SHA-256 de su contenido decide si de verdad hay datos nuevos.
+
+Requiere ``pyarrow`` (dependencia de streamlit); sin él la caché se desactiva.
+"""
+import hashlib
+import json
+import os
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+SNAPSHOT_DIR = "data/.snapshot"
+META_NAME = "meta.json"
+FORMAT_VERSION = 3
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def file_signature(paths):
+    """{ruta: [mtime_ns, tamaño]}; los archivos vacíos o inexistentes quedan en None.
+
+    Vacío e inexistente se tratan igual porque SQLite crea y borra el WAL
+    vacío al abrir y cerrar conexiones sin que cambien los datos.
+    """
+    signature = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            signature[path] = None
+            continue
+        signature[path] = [stat.st_mtime_ns, stat.st_size] if stat.st_size else None
+    return signature
+
+
+def content_hash(paths):
+    """SHA-256 del contenido de todas las fuentes, en orden"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode("utf-8") + b"\0")
+        try:
+            with open(path, "rb") as f:
+                while chunk := f.read(_HASH_CHUNK):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            pass
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SnapshotCache:
+    """Instantánea de un conjunto de DataFrames ligada a sus archivos fuente"""
+
+    def __init__(self, sources, directory=SNAPSHOT_DIR):
+        self.sources = list(sources)
+        self.directory = directory
+        self.meta_path = os.path.join(directory, META_NAME)
+
+    @property
+    def enabled(self):
+        return feather is not None
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("format") != FORMAT_VERSION:
+            return None
+        return meta
+
+    def _write_meta(self, meta):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp_path, self.meta_path)
+
+    def _read_frames(self, meta):
+        frames = {}
+        for name in meta["tables"]:
+            path = os.path.join(self.directory, f"{name}.feather")
+            frames[name] = feather.read_table(path, memory_map=True).to_pandas()
+        return frames
+
+    def load(self):
+        """Devuelve ``(frames, estado)``; ``frames`` es None si hay que reconstruir.
+
+        ``estado`` describe las fuentes en este momento y se pasa a ``save``
+        para que la instantánea quede asociada a lo que se leyó.
+        """
+        signature = file_signature(self.sources)
+        if not self.enabled:
+            return None, (signature, None)
+
+        meta = self._read_meta()
+        if meta is not None and meta["sources"] == signature:
+            try:
+                return self._read_frames(meta), (signature, meta["hash"])
+            except (OSError, ValueError):
+                pass
+
+        digest = content_hash(self.sources)
+        if meta is not None and meta["hash"] == digest:
+            # Solo cambió el mtime (archivo tocado o copiado sin cambios)
+            try:
+                frames = self._read_frames(meta)
+            except (OSError, ValueError):
+                return None, (signature, digest)
+            meta["sources"] = signature
+            self._write_meta(meta)
+            return frames, (signature, digest)
+        return None, (signature, digest)
+
+    def save(self, frames, state):
+        """Escribe los DataFrames y la metadata que los liga a ``state``"""
+        if not self.enabled:
+            return
+        signature, digest = state
+        os.makedirs(self.directory, exist_ok=True)
+        for name, df in frames.items():
+            path = os.path.join(self.directory, f"{name}.feather")
+            tmp_path = path + ".tmp"
+            feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+        self._write_meta({
+            "format": FORMAT_VERSION,
+            "sources": signature,
+            "hash": digest or content_hash(self.sources),
+            "tables": list(frames),
+        })
@@ -0,0 +1,773 @@
+"""Capa de almacenamiento de Kyla.
+
+``Store`` define el repositorio de usuarios, propiedades y solicitudes que usa
+la app; ``SQLiteStore`` es la implementación por defecto (SQLite en modo WAL).
+Otros backends se registran en ``STORE_BACKENDS`` y se eligen con la URL que
+recibe ``open_store`` (o la variable de entorno ``KYLA_STORE``).
+
+Cada alta, cambio o borrado de usuarios y propiedades queda en la tabla
+``changes`` (por triggers, así que también lo que escriban otros procesos);
+``changes_since`` devuelve solo lo nuevo para refrescar el catálogo sin
+releer las tablas completas. Las búsquedas guardadas de los usuarios y sus
+coincidencias con propiedades nuevas viven en ``saved_searches`` y
+``search_matches`` (ver ``kyla.saved_searches``).
+
+Todas las escrituras toman primero un lock de archivo (``<db>.lock``, con
+``fcntl`` donde existe) y luego el lock de escritura de SQLite (``BEGIN
+IMMEDIATE``): los escritores de varios procesos esperan su turno en orden en
+vez de reintentar. ``batch`` agrupa varias escrituras en una sola
+transacción; ``kyla.writer.WriteQueue`` lo usa para el group commit.
+
+Los CSV de ``data/`` se migran una sola vez con ``migrate_from_csv``::
+
+    python -m kyla.storage migrate
+
+Para añadir propiedades en bloque a un store que ya tiene datos está
+``kyla.importer``, que valida cada fila y reporta las rechazadas.
+"""
+import abc
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo el lock de SQLite
+    fcntl = None
+
+import pandas as pd
+
+DEFAULT_STORE_URL = "sqlite:///data/kyla.db"
+DATA_DIR = "data"
+
+USER_COLUMNS = ["id", "name", "email", "password", "phone", "rating_count", "rating_avg", "is_owner"]
+PROPERTY_COLUMNS = [
+    "id", "title", "location", "price", "beds", "baths", "area",
+    "description", "owner_id", "images", "rating", "amenities",
+]
+# Estados de una solicitud: se crea "En revisión" y el dueño la aprueba o rechaza
+STATUS_PENDING = "En revisión"
+STATUS_APPROVED = "Aprobada"
+STATUS_REJECTED = "Rechazada"
+APPLICATION_STATUSES = (STATUS_PENDING, STATUS_APPROVED, STATUS_REJECTED)
+
+APPLICATION_COLUMNS = [
+    "id", "property_id", "owner_id", "applicant_id", "property_title",
+    "applicant_name", "applicant_email", "comments", "files", "status", "created_at",
+]
+
+SAVED_SEARCH_COLUMNS = ["id", "user_id", "name", "query", "created_seq", "created_at"]
+
+# Clave de meta: hasta qué cambio del store se buscaron coincidencias
+MATCHED_SEQ_KEY = "search_matches_seq"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL,
+    password TEXT NOT NULL DEFAULT '',
+    phone TEXT NOT NULL DEFAULT '',
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    rating_avg REAL NOT NULL DEFAULT 0,
+    is_owner INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS users_email ON users (lower(trim(email)));
+
+CREATE TABLE IF NOT EXISTS properties (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL DEFAULT '',
+    location TEXT NOT NULL DEFAULT '',
+    price INTEGER NOT NULL,
+    beds INTEGER NOT NULL DEFAULT 0,
+    baths INTEGER NOT NULL DEFAULT 0,
+    area INTEGER NOT NULL DEFAULT 0,
+    description TEXT NOT NULL DEFAULT '',
+    owner_id INTEGER NOT NULL,
+    images TEXT NOT NULL DEFAULT '',
+    rating REAL NOT NULL DEFAULT 0,
+    amenities TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS properties_owner ON properties (owner_id);
+CREATE INDEX IF NOT EXISTS properties_price ON properties (price);
+
+CREATE TABLE IF NOT EXISTS applications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    property_id INTEGER NOT NULL,
+    owner_id INTEGER NOT NULL,
+    applicant_id INTEGER,
+    property_title TEXT NOT NULL DEFAULT '',
+    applicant_name TEXT NOT NULL DEFAULT '',
+    applicant_email TEXT NOT NULL DEFAULT '',
+    comments TEXT NOT NULL DEFAULT '',
+    files TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS applications_owner ON applications (owner_id, id);
+CREATE INDEX IF NOT EXISTS applications_property ON applications (property_id);
+
+CREATE TABLE IF NOT EXISTS saved_searches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    query TEXT NOT NULL,
+    created_seq INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS saved_searches_user ON saved_searches (user_id, id);
+
+CREATE TABLE IF NOT EXISTS search_matches (
+    search_id INTEGER NOT NULL,
+    property_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    seen INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (search_id, property_id)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    op TEXT NOT NULL
+);
+"""
+
+# Registro de cambios: un trigger por tabla y operación
+for _table in ("users", "properties"):
+    SCHEMA += f"""
+CREATE TRIGGER IF NOT EXISTS {_table}_insert_log AFTER INSERT ON {_table} BEGIN
+    INSERT INTO changes (table_name, row_id, op) VALUES ('{_table}', NEW.id, 'upsert');
+END;
+CREATE TRIGGER IF NOT EXISTS {_table}_update_log AFTER UPDATE ON {_table} BEGIN
+    INSERT INTO changes (table_name, row_id, op) VALUES ('{_table}', NEW.id, 'upsert');
+END;
+CREATE TRIGGER IF NOT EXISTS {_table}_delete_log AFTER DELETE ON {_table} BEGIN
+    INSERT INTO changes (table_name, row_id, op) VALUES ('{_table}', OLD.id, 'delete');
+END;
+"""
+del _table
+
+# Entradas del registro de cambios que se conservan al podarlo
+CHANGE_LOG_KEEP = 10_000
+
+# Máximo de parámetros por consulta IN (...)
+_MAX_PARAMS = 500
+
+
+class StoreError(Exception):
+    """Error al abrir o consultar el almacenamiento"""
+
+
+class DuplicateEmailError(StoreError):
+    """Ya existe un usuario con ese email (normalizado)"""
+
+
+class FileLock:
+    """Lock exclusivo entre procesos (y entre hilos) sobre un archivo, con ``flock``"""
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextlib.contextmanager
+    def hold(self):
+        if fcntl is None:
+            yield
+            return
+        # Un descriptor por adquisición: flock también excluye a otros hilos del proceso
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+
+@dataclass
+class ChangeSet:
+    """Cambios del store entre dos secuencias del registro"""
+
+    seq: int
+    users: pd.DataFrame
+    properties: pd.DataFrame
+    # Hubo borrados: el catálogo no los aplica por partes
+    deleted: bool = False
+    # False si el registro ya se podó y faltan cambios
+    complete: bool = True
+
+    @property
+    def empty(self):
+        return self.users.empty and self.properties.empty and not self.deleted
+
+
+class Store(abc.ABC):
+    """Repositorio de usuarios, propiedades y solicitudes.
+
+    Los backends implementan todos los métodos abstractos; si falta alguno,
+    la clase no se puede instanciar.
+    """
+
+    @abc.abstractmethod
+    def users(self):
+        """Todos los usuarios como DataFrame con USER_COLUMNS"""
+
+    @abc.abstractmethod
+    def properties(self):
+        """Todas las propiedades como DataFrame con PROPERTY_COLUMNS"""
+
+    @abc.abstractmethod
+    def find_user_by_email(self, email):
+        """Usuario (dict) con ese email normalizado, o None"""
+
+    @abc.abstractmethod
+    def owner_ids(self):
+        """Ids de los usuarios arrendadores"""
+
+    @abc.abstractmethod
+    def add_user(self, user):
+        """Inserta un usuario y devuelve su id; levanta DuplicateEmailError si el email ya existe"""
+
+    @abc.abstractmethod
+    def add_properties(self, rows):
+        """Inserta propiedades y devuelve sus ids"""
+
+    @abc.abstractmethod
+    def update_property(self, property_id, **fields):
+        """Actualiza columnas de una propiedad"""
+
+    @abc.abstractmethod
+    def add_application(self, application):
+        """Inserta una solicitud y devuelve su id.
+
+        ``files`` es una lista de ``{"name", "sha256", "size"}`` que apuntan a
+        documentos guardados en ``kyla.documents.DocumentStore``.
+        """
+
+    @abc.abstractmethod
+    def set_application_status(self, application_id, status):
+        """Cambia el estado de una solicitud"""
+
+    @abc.abstractmethod
+    def applications_for_owner(self, owner_id, limit=20, offset=0):
+        """Página de solicitudes recibidas por un dueño, más recientes primero"""
+
+    @abc.abstractmethod
+    def count_applications_for_owner(self, owner_id):
+        """Total de solicitudes recibidas por un dueño"""
+
+    @abc.abstractmethod
+    def document_access(self, digest):
+        """``[(owner_id, applicant_id, nombre)]`` de las solicitudes que adjuntan el documento ``digest``"""
+
+    @abc.abstractmethod
+    def add_saved_search(self, search):
+        """Guarda una búsqueda y devuelve su id.
+
+        ``query`` es la consulta en JSON y ``created_seq`` el último cambio del
+        store al guardarla: solo cuentan las propiedades que cambien después.
+        """
+
+    @abc.abstractmethod
+    def saved_searches(self, user_id=None):
+        """Búsquedas guardadas de un usuario (o de todos) como dicts"""
+
+    @abc.abstractmethod
+    def delete_saved_search(self, search_id, user_id):
+        """Borra una búsqueda del usuario junto con sus coincidencias"""
+
+    @abc.abstractmethod
+    def changed_properties(self, after, until):
+        """``({id: último cambio}, primero)`` de las propiedades creadas o modificadas entre ``after`` y ``until``.
+
+        ``primero`` es el cambio más antiguo que conserva el registro (None si
+        está vacío); si es mayor que ``after + 1`` el rango ya se podó en parte.
+        """
+
+    @abc.abstractmethod
+    def matched_seq(self):
+        """Último cambio ya comparado con las búsquedas guardadas, o None"""
+
+    @abc.abstractmethod
+    def record_search_matches(self, matches, seq):
+        """Guarda pares ``(search_id, property_id)`` y avanza ``matched_seq`` hasta ``seq``"""
+
+    @abc.abstractmethod
+    def new_matches_for_user(self, user_id, limit=20):
+        """Coincidencias no vistas de las búsquedas del usuario, más recientes primero"""
+
+    @abc.abstractmethod
+    def mark_matches_seen(self, user_id):
+        """Marca como vistas las coincidencias de las búsquedas del usuario"""
+
+    @abc.abstractmethod
+    def is_empty(self):
+        """True si el store no tiene usuarios ni propiedades"""
+
+    @abc.abstractmethod
+    def last_change(self):
+        """Secuencia del último cambio registrado (0 si no hay)"""
+
+    @abc.abstractmethod
+    def changes_since(self, seq):
+        """``ChangeSet`` con las filas nuevas o modificadas después de ``seq``"""
+
+    def prune_changes(self, keep=CHANGE_LOG_KEEP, before=None):
+        """Borra el registro de cambios salvo las últimas ``keep`` entradas.
+
+        Nunca borra cambios posteriores a ``before`` (el más antiguo que el
+        llamador aún necesita) ni los que las búsquedas guardadas no revisaron.
+        """
+
+    def source_files(self):
+        """Archivos cuyo contenido determina los datos (para invalidar cachés)"""
+        return []
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Las escrituras dentro del bloque se confirman juntas al salir"""
+        yield self
+
+    def close(self):
+        pass
+
+
+class SQLiteStore(Store):
+    """Store sobre SQLite en modo WAL, con una conexión por hilo"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.write_lock = FileLock(path + ".lock")
+        with self.write_lock.hold():
+            self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                conn = sqlite3.connect(self.path, timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.Error as e:
+                raise StoreError(f"No se pudo abrir {self.path}: {e}") from e
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self.conn
+        if getattr(self._local, "in_batch", False):
+            # Dentro de batch(): cada escritura es un savepoint de la transacción común,
+            # así una escritura que falla no deshace las demás del lote
+            conn.execute("SAVEPOINT write")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK TO write")
+                conn.execute("RELEASE write")
+                raise
+            conn.execute("RELEASE write")
+            return
+
+        with self.write_lock.hold():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    @contextlib.contextmanager
+    def batch(self):
+        if getattr(self._local, "in_batch", False):
+            yield self
+            return
+        with self._transaction():
+            self._local.in_batch = True
+            try:
+                yield self
+            finally:
+                self._local.in_batch = False
+
+    def _insert(self, conn, table, columns, row):
+        cols = [c for c in columns if c in row]
+        placeholders = ", ".join("?" for _ in cols)
+        cur = conn.execute(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({placeholders})",
+            [row[c] for c in cols],
+        )
+        return cur.lastrowid
+
+    def users(self):
+        return pd.read_sql_query(f"SELECT {', '.join(USER_COLUMNS)} FROM users ORDER BY id", self.conn)
+
+    def properties(self):
+        return pd.read_sql_query(
+            f"SELECT {', '.join(PROPERTY_COLUMNS)} FROM properties ORDER BY id", self.conn
+        )
+
+    def find_user_by_email(self, email):
+        row = self.conn.execute(
+            "SELECT * FROM users WHERE lower(trim(email)) = ? ORDER BY id LIMIT 1",
+            (str(email).strip().lower(),),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def owner_ids(self):
+        return [row[0] for row in self.conn.execute("SELECT id FROM users WHERE is_owner ORDER BY id")]
+
+    def add_user(self, user):
+        cols = [c for c in USER_COLUMNS if c in user]
+        with self._transaction() as conn:
+            # Comprobación e inserción en una sola sentencia, con el lock de escritura tomado
+            cur = conn.execute(
+                f"INSERT INTO users ({', '.join(cols)}) SELECT {', '.join('?' for _ in cols)} "
+                "WHERE NOT EXISTS (SELECT 1 FROM users WHERE lower(trim(email)) = ?)",
+                [*(user[c] for c in cols), str(user["email"]).strip().lower()],
+            )
+            if cur.rowcount == 0:
+                raise DuplicateEmailError(f"El email {user['email']} ya está registrado")
+            return cur.lastrowid
+
+    def add_properties(self, rows):
+        with self._transaction() as conn:
+            return [self._insert(conn, "properties", PROPERTY_COLUMNS, row) for row in rows]
+
+    def update_property(self, property_id, **fields):
+        unknown = set(fields) - set(PROPERTY_COLUMNS[1:])
+        if unknown:
+            raise StoreError(f"Columnas desconocidas: {sorted(unknown)}")
+        assignments = ", ".join(f"{col} = ?" for col in fields)
+        with self._transaction() as conn:
+            conn.execute(
+                f"UPDATE properties SET {assignments} WHERE id = ?",
+                [*fields.values(), property_id],
+            )
+
+    def add_application(self, application):
+        row = dict(application)
+        row["files"] = json.dumps(list(row.get("files", [])), ensure_ascii=False)
+        row.setdefault("created_at", datetime.datetime.now().isoformat(timespec="seconds"))
+        with self._transaction() as conn:
+            return self._insert(conn, "applications", APPLICATION_COLUMNS, row)
+
+    def set_application_status(self, application_id, status):
+        if status not in APPLICATION_STATUSES:
+            raise StoreError(f"Estado de solicitud desconocido: {status}")
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE applications SET status = ? WHERE id = ? AND status != ?",
+                (status, application_id, status),
+            )
+
+    def applications_for_owner(self, owner_id, limit=20, offset=0):
+        # Recorre el índice (owner_id, id) hacia atrás: sin ordenar en memoria
+        rows = self.conn.execute(
+            f"SELECT {', '.join(APPLICATION_COLUMNS)} FROM applications "
+            "WHERE owner_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (owner_id, limit, offset),
+        ).fetchall()
+        return [_decode_application(row) for row in rows]
+
+    def document_access(self, digest):
+        # El LIKE descarta casi todo; el JSON confirma que es un adjunto de la solicitud
+        rows = self.conn.execute(
+            "SELECT owner_id, applicant_id, files FROM applications WHERE files LIKE ?",
+            (f"%{digest}%",),
+        ).fetchall()
+        return [
+            (row["owner_id"], row["applicant_id"], entry["name"])
+            for row in rows
+            for entry in map(_decode_file, json.loads(row["files"]))
+            if entry["sha256"] == digest
+        ]
+
+    def count_applications_for_owner(self, owner_id):
+        row = self.conn.execute(
+            "SELECT count(*) FROM applications WHERE owner_id = ?", (owner_id,)
+        ).fetchone()
+        return row[0]
+
+    def add_saved_search(self, search):
+        row = dict(search)
+        row.setdefault("created_at", datetime.datetime.now().isoformat(timespec="seconds"))
+        with self._transaction() as conn:
+            return self._insert(conn, "saved_searches", SAVED_SEARCH_COLUMNS, row)
+
+    def saved_searches(self, user_id=None):
+        sql = f"SELECT {', '.join(SAVED_SEARCH_COLUMNS)} FROM saved_searches"
+        if user_id is None:
+            rows = self.conn.execute(sql + " ORDER BY id").fetchall()
+        else:
+            rows = self.conn.execute(sql + " WHERE user_id = ? ORDER BY id", (user_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_saved_search(self, search_id, user_id):
+        with self._transaction() as conn:
+            deleted = conn.execute(
+                "DELETE FROM saved_searches WHERE id = ? AND user_id = ?", (search_id, user_id)
+            ).rowcount
+            if deleted:
+                conn.execute("DELETE FROM search_matches WHERE search_id = ?", (search_id,))
+
+    def changed_properties(self, after, until):
+        conn = self.conn
+        # Una sola transacción de lectura: la poda no se cuela entre las dos consultas
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                "SELECT row_id, max(seq) FROM changes "
+                "WHERE table_name = 'properties' AND op = 'upsert' AND seq > ? AND seq <= ? GROUP BY row_id",
+                (after, until),
+            ).fetchall()
+            first = conn.execute("SELECT min(seq) FROM changes").fetchone()[0]
+        finally:
+            conn.rollback()
+        return dict(rows), first
+
+    def matched_seq(self):
+        value = self.get_meta(MATCHED_SEQ_KEY)
+        return int(value) if value is not None else None
+
+    def record_search_matches(self, matches, seq):
+        with self._transaction() as conn:
+            # Una propiedad que vuelve a coincidir (p. ej. al editarla) conserva su estado de vista
+            conn.executemany(
+                "INSERT OR IGNORE INTO search_matches (search_id, property_id, seq) VALUES (?, ?, ?)",
+                ((search_id, property_id, seq) for search_id, property_id in matches),
+            )
+            current = conn.execute("SELECT value FROM meta WHERE key = ?", (MATCHED_SEQ_KEY,)).fetchone()
+            if current is None or int(current[0]) < seq:
+                self.set_meta(MATCHED_SEQ_KEY, str(seq), conn)
+
+    def new_matches_for_user(self, user_id, limit=20):
+        rows = self.conn.execute(
+            "SELECT m.search_id, s.name AS search_name, m.property_id, m.seq "
+            "FROM saved_searches s JOIN search_matches m ON m.search_id = s.id "
+            "WHERE s.user_id = ? AND m.seen = 0 ORDER BY m.seq DESC, m.property_id DESC LIMIT ?",
+            (user_id, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_matches_seen(self, user_id):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE search_matches SET seen = 1 WHERE seen = 0 "
+                "AND search_id IN (SELECT id FROM saved_searches WHERE user_id = ?)",
+                (user_id,),
+            )
+
+    def is_empty(self):
+        row = self.conn.execute(
+            "SELECT (SELECT count(*) FROM users) + (SELECT count(*) FROM properties)"
+        ).fetchone()
+        return row[0] == 0
+
+    def last_change(self, conn=None):
+        row = (conn or self.conn).execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+    def _rows_by_id(self, conn, table, columns, ids):
+        frames = []
+        for start in range(0, len(ids), _MAX_PARAMS):
+            chunk = ids[start:start + _MAX_PARAMS]
+            frames.append(pd.read_sql_query(
+                f"SELECT {', '.join(columns)} FROM {table} "
+                f"WHERE id IN ({', '.join('?' for _ in chunk)}) ORDER BY id",
+                conn, params=chunk,
+            ))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def changes_since(self, seq):
+        conn = self.conn
+        # Una sola transacción de lectura: registro y filas del mismo instante
+        conn.execute("BEGIN")
+        try:
+            last = self.last_change(conn)
+            first = conn.execute("SELECT min(seq) FROM changes").fetchone()[0]
+            log = conn.execute(
+                "SELECT table_name, row_id, op FROM changes WHERE seq > ? AND seq <= ? ORDER BY seq",
+                (seq, last),
+            ).fetchall()
+            upserts = {"users": set(), "properties": set()}
+            deleted = False
+            for table, row_id, op in log:
+                if op == "delete":
+                    deleted = True
+                else:
+                    upserts[table].add(row_id)
+            users = self._rows_by_id(conn, "users", USER_COLUMNS, sorted(upserts["users"]))
+            properties = self._rows_by_id(conn, "properties", PROPERTY_COLUMNS, sorted(upserts["properties"]))
+        finally:
+            conn.rollback()
+        return ChangeSet(
+            seq=last,
+            users=users,
+            properties=properties,
+            deleted=deleted,
+            complete=last == seq or (first is not None and first <= seq + 1),
+        )
+
+    def prune_changes(self, keep=CHANGE_LOG_KEEP, before=None):
+        with self._transaction() as conn:
+            limit = self.last_change(conn) - keep
+            if before is not None:
+                limit = min(limit, before)
+            # Lo que SearchMatcher todavía no comparó (si hay búsquedas guardadas)
+            floor = conn.execute(
+                "SELECT CASE WHEN NOT EXISTS (SELECT 1 FROM saved_searches) THEN NULL "
+                "ELSE coalesce((SELECT CAST(value AS INTEGER) FROM meta WHERE key = ?), "
+                "(SELECT min(created_seq) FROM saved_searches)) END",
+                (MATCHED_SEQ_KEY,),
+            ).fetchone()[0]
+            if floor is not None:
+                limit = min(limit, floor)
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (limit,))
+
+    def source_files(self):
+        return [self.path, self.path + "-wal"]
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_meta(self, key, value, conn=None):
+        (conn or self.conn).execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def bulk_load(self, users, properties, if_empty=False):
+        """Inserta DataFrames completos conservando sus ids, en una transacción.
+
+        Con ``if_empty`` no hace nada (y devuelve False) si el store ya tiene
+        datos; la comprobación va dentro de la transacción, así que de varios
+        procesos que arrancan a la vez solo uno migra.
+        """
+        with self._transaction() as conn:
+            if if_empty and not self.is_empty():
+                return False
+            conn.executemany(
+                f"INSERT INTO users ({', '.join(USER_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in USER_COLUMNS)})",
+                users[USER_COLUMNS].itertuples(index=False, name=None),
+            )
+            conn.executemany(
+                f"INSERT INTO properties ({', '.join(PROPERTY_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in PROPERTY_COLUMNS)})",
+                properties[PROPERTY_COLUMNS].itertuples(index=False, name=None),
+            )
+            self.set_meta("migrated_at", datetime.datetime.now().isoformat(timespec="seconds"), conn)
+            # La carga inicial se lee completa: no hace falta su registro de cambios
+            conn.execute("DELETE FROM changes")
+        return True
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _decode_file(entry):
+    # Las solicitudes anteriores a kyla.documents solo guardaban el nombre
+    if isinstance(entry, str):
+        return {"name": entry, "sha256": None, "size": None}
+    return entry
+
+
+def _decode_application(row):
+    application = dict(row)
+    application["files"] = [_decode_file(entry) for entry in json.loads(application["files"])]
+    application["created_at"] = datetime.datetime.fromisoformat(application["created_at"])
+    return application
+
+
+STORE_BACKENDS = {"sqlite": SQLiteStore}
+
+
+def open_store(url=None):
+    """Abre el Store indicado por ``url`` (``backend:///ruta``)"""
+    url = url or os.environ.get("KYLA_STORE", DEFAULT_STORE_URL)
+    backend, sep, path = url.partition(":///")
+    if not sep or backend not in STORE_BACKENDS:
+        raise StoreError(f"URL de almacenamiento no soportada: {url}")
+    return STORE_BACKENDS[backend](path)
+
+
+# ======================
+# MIGRACIÓN DESDE CSV
+# ======================
+def _to_bool_int(value):
+    return int(str(value).strip().lower() in ("true", "1", "yes", "si", "sí"))
+
+
+def read_csv_data(data_dir=DATA_DIR):
+    """Lee y limpia los CSV originales con las mismas reglas que usaba load_data"""
+    properties = pd.read_csv(os.path.join(data_dir, "properties.csv"), encoding="utf-8-sig")
+    users = pd.read_csv(os.path.join(data_dir, "users.csv"), encoding="utf-8-sig")
+
+    # Filas con precio no numérico se descartan
+    properties["price"] = pd.to_numeric(properties["price"], errors="coerce")
+    properties = properties.dropna(subset=["price"])
+    properties["price"] = properties["price"].astype(int)
+    for col in ["beds", "baths", "area", "owner_id"]:
+        properties[col] = pd.to_numeric(properties[col], errors="coerce").fillna(0).astype(int)
+    properties["rating"] = pd.to_numeric(properties["rating"], errors="coerce").fillna(0)
+    for col in ["title", "location", "description", "images", "amenities"]:
+        properties[col] = properties[col].fillna("").astype(str)
+
+    for col in ["name", "email", "password", "phone"]:
+        users[col] = users[col].fillna("").astype(str)
+    users["rating_count"] = pd.to_numeric(users["rating_count"], errors="coerce").fillna(0).astype(int)
+    users["rating_avg"] = pd.to_numeric(users["rating_avg"], errors="coerce").fillna(0)
+    users["is_owner"] = users["is_owner"].map(_to_bool_int)
+    return properties, users
+
+
+def migrate_from_csv(store, data_dir=DATA_DIR):
+    """Copia los CSV al store si aún está vacío. Devuelve True si migró"""
+    if not store.is_empty():
+        return False
+    properties, users = read_csv_data(data_dir)
+    return store.bulk_load(users, properties, if_empty=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Herramientas del almacenamiento de Kyla")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="migrar data/*.csv al store")
+    migrate.add_argument("--store", default=None, help=f"URL del store (por defecto {DEFAULT_STORE_URL})")
+    migrate.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args(argv)
+
+    store = open_store(args.store)
+    if migrate_from_csv(store, args.data_dir):
+        print("Migración completada.")
+    else:
+        print("El store ya tiene datos; no se migró nada.")
+
+
+if __name__ == "__main__":
+    main()
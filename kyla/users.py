@@ -0,0 +1,73 @@
+"""Índices sobre la tabla de usuarios."""
+import numpy as np
+import pandas as pd
+
+
+def normalize_email(email):
+    """Email en minúsculas y sin espacios, la forma usada como clave"""
+    return str(email).strip().lower()
+
+
+def build_email_index(users):
+    """Construye el índice email normalizado → posición de fila en ``users``.
+
+    Si hay emails repetidos gana la primera fila, como en la búsqueda anterior.
+    """
+    index = {}
+    for pos, email in enumerate(users["email"].tolist()):
+        index.setdefault(normalize_email(email), pos)
+    return index
+
+
+def update_email_index(index, old_users, users, positions):
+    """Copia de ``index`` tras cambiar o añadir las filas ``positions`` de ``users``.
+
+    Mantiene la regla de ``build_email_index``: con emails repetidos gana la
+    fila de menor posición.
+    """
+    index = dict(index)
+    for pos in positions:
+        email = normalize_email(users["email"].iat[pos])
+        if pos < len(old_users):
+            old_email = normalize_email(old_users["email"].iat[pos])
+            if old_email != email and index.get(old_email) == pos:
+                # El email viejo pasa a la siguiente fila que lo tenga, si hay
+                others = np.flatnonzero(users["email"].str.strip().str.lower().to_numpy() == old_email)
+                if len(others):
+                    index[old_email] = int(others[0])
+                else:
+                    del index[old_email]
+        if index.get(email, pos + 1) > pos:
+            index[email] = int(pos)
+    return index
+
+
+# Columnas del arrendador que se copian a cada propiedad
+OWNER_COLUMNS = {
+    "name": "owner_name",
+    "rating_avg": "owner_rating_avg",
+    "rating_count": "owner_rating_count",
+    "phone": "owner_phone",
+}
+
+
+def build_owner_view(users):
+    """Vista de arrendadores indexada por id con las columnas owner_*"""
+    return (
+        users.drop_duplicates("id")
+        .set_index("id")[list(OWNER_COLUMNS)]
+        .rename(columns=OWNER_COLUMNS)
+    )
+
+
+def join_owners(properties, users):
+    """Devuelve ``properties`` con los datos de su arrendador ya unidos.
+
+    La unión se hace una vez al cargar o al escribir propiedades, para que
+    renderizar un listado no tenga que buscar cada dueño en ``users``.
+    """
+    base = properties.drop(columns=list(OWNER_COLUMNS.values()), errors="ignore")
+    # reindex en vez de join: conserva el tipo (categórico) de owner_id
+    owners = build_owner_view(users).reindex(np.asarray(base["owner_id"]))
+    owners.index = base.index
+    return pd.concat([base, owners], axis=1)
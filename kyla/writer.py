@@ -0,0 +1,97 @@
+"""Escritor único por proceso con group commit.
+
+Las sesiones no escriben en el store directamente: encolan la escritura en
+``WriteQueue`` y esperan su resultado. Un solo hilo escritor toma lo que haya
+en la cola (hasta ``max_batch`` escrituras) y lo confirma en una única
+transacción de ``Store.batch``; con muchos registros simultáneos se paga un
+commit (y un fsync) por lote en vez de uno por escritura.
+
+Cada escritura del lote es independiente: si una falla (p. ej. un email
+repetido) su savepoint se deshace y solo esa llamada recibe la excepción.
+Entre procesos, el orden lo ponen el lock de archivo y el de SQLite del store.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+DEFAULT_MAX_BATCH = 256
+# Espera para juntar más escrituras cuando el lote recién empieza
+DEFAULT_MAX_WAIT = 0.001
+
+
+class WriteQueue:
+    """Cola de escrituras sobre ``store`` atendida por un hilo propio"""
+
+    def __init__(self, store, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="kyla-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Encola ``fn(*args, **kwargs)`` (un método de escritura del store); devuelve un Future"""
+        if self._closed:
+            raise RuntimeError("La cola de escritura está cerrada")
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Encola la escritura y espera a que esté confirmada; devuelve su resultado"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self):
+        """Termina de escribir lo encolado y detiene el hilo"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self):
+        return {"lotes": self.batches, "escrituras": self.writes}
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=self.max_wait) if len(batch) == 1 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Cierre: se escribe este lote y luego se sale
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while (batch := self._next_batch()) is not None:
+            done = []
+            try:
+                with self.store.batch():
+                    for fn, args, kwargs, future in batch:
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        try:
+                            done.append((future, fn(*args, **kwargs)))
+                        except Exception as e:
+                            future.set_exception(e)
+            except Exception as e:
+                # Falló la transacción: ninguna escritura del lote quedó guardada
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            # Los resultados se entregan solo después del commit
+            for future, result in done:
+                future.set_result(result)
+            self.batches += 1
+            self.writes += len(done)